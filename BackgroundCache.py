@@ -0,0 +1,132 @@
+import hashlib
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from PyQt5.QtCore import Qt, QObject, QSize, QTimer, pyqtSignal
+from PyQt5.QtGui import QPixmap
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.image_conversion_tools', 'background_cache')
+
+# 本次运行中已经缩放过的背景图片
+_pixmaps = {}
+
+
+def cache_path(image_path, width, height, cache_dir=None):
+    # 原图路径、大小、修改时间和目标尺寸共同决定缓存文件名，原图被替换后自动失效
+    stat = os.stat(image_path)
+    key = hashlib.sha1(repr((os.path.abspath(image_path), stat.st_size, stat.st_mtime_ns, width, height))
+                       .encode('utf-8')).hexdigest()
+    return os.path.join(cache_dir or DEFAULT_CACHE_DIR, f'{key}.png')
+
+
+def scaled_background(image_path, width, height, cache_dir=None):
+    # 背景图片按窗口大小缩放后保存到缓存文件夹，之后启动只需解码窗口大小的图片，不再解码原图
+    key = (image_path, width, height)
+    if key in _pixmaps:
+        return _pixmaps[key]
+
+    try:
+        path = cache_path(image_path, width, height, cache_dir)
+    except OSError:
+        # 原图不存在时和QPixmap一样返回空图片
+        return QPixmap()
+
+    pixmap = QPixmap(path) if os.path.exists(path) else QPixmap()
+    if pixmap.isNull():
+        pixmap = QPixmap(image_path)
+        if pixmap.isNull():
+            return pixmap
+        pixmap = pixmap.scaled(width, height, Qt.KeepAspectRatioByExpanding, Qt.SmoothTransformation)
+
+        # 先写到临时文件再改名，多个窗口同时启动也不会读到不完整的缓存
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f'{path}.{os.getpid()}.tmp'
+        if pixmap.save(temp_path, 'PNG'):
+            os.replace(temp_path, path)
+
+    _pixmaps[key] = pixmap
+    return pixmap
+
+
+class BackgroundRenderer(QObject):
+    # 窗口背景的绘制缓存：只在窗口大小变化时重新缩放，重绘时直接绘制缓存的图片
+    # 拖动调整窗口大小期间使用快速缩放，停止调整后在后台线程中平滑缩放，完成后再刷新窗口
+    smooth_ready = pyqtSignal(QSize, object)
+
+    def __init__(self, widget, pixmap, settle_ms=150):
+        super().__init__(widget)
+        self.widget = widget
+        self.pixmap = pixmap
+        self.scaled = None
+        self.smooth = False
+
+        # 绘制开销统计，用于诊断
+        self.paint_count = 0
+        self.paint_seconds = 0.0
+        self.scale_count = 0
+        self.scale_seconds = 0.0
+
+        # 调整大小停止settle_ms毫秒后才进行平滑缩放
+        self.settle_timer = QTimer(self)
+        self.settle_timer.setSingleShot(True)
+        self.settle_timer.setInterval(settle_ms)
+        self.settle_timer.timeout.connect(self.start_smooth_scale)
+
+        # QPixmap只能在界面线程中使用，后台线程缩放QImage
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.source_image = None
+        self.smooth_ready.connect(self.apply_smooth_scale)
+
+    def resized(self):
+        self.settle_timer.start()
+
+    def scale(self, size, transformation):
+        start = time.perf_counter()
+        self.scaled = self.pixmap.scaled(size, Qt.KeepAspectRatioByExpanding, transformation)
+        self.smooth = transformation == Qt.SmoothTransformation
+        self.scale_count += 1
+        self.scale_seconds += time.perf_counter() - start
+
+    def paint(self, painter):
+        if self.pixmap.isNull():
+            return
+        start = time.perf_counter()
+        size = self.widget.size()
+        if self.scaled is None:
+            # 第一次绘制直接平滑缩放
+            self.scale(size, Qt.SmoothTransformation)
+        elif not self.covers(size):
+            self.scale(size, Qt.FastTransformation)
+            self.settle_timer.start()
+        painter.drawPixmap(0, 0, self.scaled)
+        self.paint_count += 1
+        self.paint_seconds += time.perf_counter() - start
+
+    def covers(self, size):
+        # 缓存的图片正好是当前窗口按比例填充后的大小时才能直接使用
+        target = self.pixmap.size().scaled(size, Qt.KeepAspectRatioByExpanding)
+        return self.scaled.size() == target
+
+    def start_smooth_scale(self):
+        if self.pixmap.isNull() or (self.smooth and self.covers(self.widget.size())):
+            return
+        if self.source_image is None:
+            self.source_image = self.pixmap.toImage()
+        size = self.widget.size()
+        image = self.source_image
+        self.executor.submit(lambda: self.smooth_ready.emit(
+            size, image.scaled(size, Qt.KeepAspectRatioByExpanding, Qt.SmoothTransformation)))
+
+    def apply_smooth_scale(self, size, image):
+        # 缩放期间窗口大小又变化时丢弃结果，等待下一次平滑缩放
+        if size != self.widget.size():
+            return
+        self.scaled = QPixmap.fromImage(image)
+        self.smooth = True
+        self.scale_count += 1
+        self.widget.update()
+
+    def stats(self):
+        return {'paint_count': self.paint_count, 'paint_seconds': self.paint_seconds,
+                'scale_count': self.scale_count, 'scale_seconds': self.scale_seconds}
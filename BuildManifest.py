@@ -0,0 +1,52 @@
+import json
+import os
+
+# 生成记录保存在输出文件夹中
+MANIFEST_NAME = '.image_export_manifest.json'
+
+
+class BuildManifest:
+    def __init__(self, output_folder, settings):
+        self.path = os.path.join(output_folder, MANIFEST_NAME)
+        # 设置经过一次JSON转换，保证和读取出的记录可以直接比较
+        self.settings = json.loads(json.dumps(settings))
+        self.folders = {}
+
+        # 只有设置完全相同时之前的记录才有效
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('settings') == self.settings:
+                self.folders = data.get('folders', {})
+        except (OSError, ValueError):
+            pass
+
+    @staticmethod
+    def folder_state(folder, restat=False):
+        # 记录子文件夹中每张图片的文件名、大小和修改时间，默认使用扫描时得到的结果
+        state = []
+        for image in folder.images:
+            if restat:
+                stat = os.stat(image.path)
+                state.append([image.name, stat.st_size, stat.st_mtime_ns])
+            else:
+                state.append([image.name, image.size, image.mtime_ns])
+        return state
+
+    def is_current(self, folder, output_path):
+        # 图片没有变化且输出文件还在时不需要重新生成
+        if folder.key not in self.folders or not os.path.exists(output_path):
+            return False
+        return self.folders[folder.key] == self.folder_state(folder)
+
+    def mark_done(self, folder, restat=False):
+        # 每生成完一个文件就保存一次记录，程序中断后可以从这里继续
+        # 压缩结果覆盖了原图时需要重新读取图片的大小和修改时间
+        self.folders[folder.key] = self.folder_state(folder, restat)
+        self.save()
+
+    def save(self):
+        temp_path = f'{self.path}.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump({'settings': self.settings, 'folders': self.folders}, f, ensure_ascii=False)
+        os.replace(temp_path, self.path)
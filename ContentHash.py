@@ -0,0 +1,65 @@
+import hashlib
+import shutil
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+
+def file_digest(path):
+    sha1 = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(partial(f.read, 1024 * 1024), b''):
+            sha1.update(chunk)
+    return sha1.hexdigest()
+
+
+def content_keys(images, jobs):
+    # 按文件内容给每张图片一个键，内容完全相同的图片键相同
+    # 大小相同的文件才可能内容相同，只读取这些文件计算哈希，其余图片返回None
+    counts = Counter(image.size for image in images)
+    candidates = [image.path for image in images if counts[image.size] > 1]
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        digests = dict(zip(candidates, executor.map(file_digest, candidates)))
+    return [digests.get(image.path) for image in images]
+
+
+def first_occurrences(keys):
+    # 每组内容相同的图片中只有第一张为True，只需要处理这些图片
+    seen = set()
+    first = []
+    for key in keys:
+        first.append(key is None or key not in seen)
+        seen.add(key)
+    return first
+
+
+def copy_result(result, image_path):
+    # 覆盖原图时，重复的图片直接复制第一张的压缩结果
+    shutil.copyfile(result, image_path)
+    return image_path
+
+
+def expand_duplicates(results, keys, image_paths, reuse=None, on_timings=None):
+    # results为每组第一张图片按顺序的处理结果，展开为全部图片的结果
+    # 重复的图片使用第一张的结果，reuse(结果, 图片路径)不为None时用它得到重复图片的结果
+    # 第一张的结果只保留到这一组最后一张图片取走为止
+    remaining = Counter(key for key in keys if key is not None)
+    results_by_key = {}
+    try:
+        for key, image_path in zip(keys, image_paths):
+            if key is None:
+                yield next(results)
+                continue
+            remaining[key] -= 1
+            if key in results_by_key:
+                result = results_by_key[key] if remaining[key] else results_by_key.pop(key)
+                if on_timings:
+                    on_timings({'duplicate': 1})
+                yield reuse(result, image_path) if reuse else result
+            else:
+                result = next(results)
+                if remaining[key]:
+                    results_by_key[key] = result
+                yield result
+    finally:
+        results.close()
@@ -0,0 +1,185 @@
+import hashlib
+import os
+import shutil
+import tempfile
+import zipfile
+from xml.sax.saxutils import quoteattr
+
+import docx
+from docx import Document
+from docx.image.image import Image as DocxImage
+from docx.shared import Cm
+from lxml import etree
+
+try:
+    from .TableBuilder import TableBuilder
+except ImportError:
+    from TableBuilder import TableBuilder
+
+RELS_NS = 'http://schemas.openxmlformats.org/package/2006/relationships'
+TYPES_NS = 'http://schemas.openxmlformats.org/package/2006/content-types'
+IMAGE_REL_TYPE = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships/image'
+
+# 与python-docx的run.add_picture生成的图片段落保持一致
+PICTURE_XML = (
+    '<w:p><w:r><w:drawing>'
+    '<wp:inline xmlns:a="http://schemas.openxmlformats.org/drawingml/2006/main" '
+    'xmlns:pic="http://schemas.openxmlformats.org/drawingml/2006/picture">'
+    '<wp:extent cx="{cx}" cy="{cy}"/><wp:docPr id="{shape_id}" name="Picture {shape_id}"/>'
+    '<wp:cNvGraphicFramePr><a:graphicFrameLocks noChangeAspect="1"/></wp:cNvGraphicFramePr>'
+    '<a:graphic><a:graphicData uri="http://schemas.openxmlformats.org/drawingml/2006/picture"><pic:pic>'
+    '<pic:nvPicPr><pic:cNvPr id="0" name={name}/><pic:cNvPicPr/></pic:nvPicPr>'
+    '<pic:blipFill><a:blip r:embed="{rel_id}"/><a:stretch><a:fillRect/></a:stretch></pic:blipFill>'
+    '<pic:spPr><a:xfrm><a:off x="0" y="0"/><a:ext cx="{cx}" cy="{cy}"/></a:xfrm><a:prstGeom prst="rect"/></pic:spPr>'
+    '</pic:pic></a:graphicData></a:graphic></wp:inline></w:drawing></w:r></w:p>'
+)
+
+
+def default_template_path():
+    return os.path.join(os.path.dirname(docx.__file__), 'templates', 'default.docx')
+
+
+def read_image(image):
+    # 图片可以是文件路径，也可以是已经打开的文件对象
+    if isinstance(image, str):
+        with open(image, 'rb') as f:
+            return f.read(), os.path.basename(image)
+    image.seek(0)
+    return image.read(), None
+
+
+class DocxWriter:
+    # 使用python-docx生成文档，全部内容在内存中，保存时一次写出
+    # python-docx按内容哈希保存图片，内容相同的图片在文档中只保存一份
+    def __init__(self, docx_path, rows, cols, image_width, image_height):
+        self.docx_path = docx_path
+        self.width = Cm(image_width)
+        self.height = Cm(image_height)
+        self.document = Document()
+        self.table = TableBuilder(self.document, rows, cols)
+
+    def add_picture(self, image):
+        cell = self.table.next_cell()
+        paragraph = cell.add_paragraph()
+        run = paragraph.add_run()
+        run.add_picture(image, width=self.width, height=self.height)
+
+    def save(self):
+        self.document.save(self.docx_path)
+
+    def abort(self):
+        # 放弃未完成的文档，内存中的内容直接丢弃即可
+        self.document = None
+
+
+class StreamingDocxWriter:
+    # 流式生成文档：每张图片处理完立即写入压缩包，表格XML逐行写入临时文件，内存占用与图片数量无关
+    def __init__(self, docx_path, rows, cols, image_width, image_height):
+        self.docx_path = docx_path
+        self.rows = rows
+        self.cols = cols
+        self.cx = Cm(image_width)
+        self.cy = Cm(image_height)
+        self.index = 0
+        # 图片内容哈希对应的关系ID，内容相同的图片只写入一份，各单元格引用同一个关系
+        self.media = {}
+
+        # 先写到临时文件，全部完成后再改名，中途出错不会留下不完整的文档
+        self.temp_path = f'{docx_path}.part'
+        self.zip_file = zipfile.ZipFile(self.temp_path, 'w', zipfile.ZIP_DEFLATED)
+        self.body = tempfile.TemporaryFile()
+
+        # 复制python-docx默认模板中的样式、主题等部件
+        with zipfile.ZipFile(default_template_path()) as template:
+            for name in template.namelist():
+                if name in ('[Content_Types].xml', 'word/document.xml', 'word/_rels/document.xml.rels'):
+                    continue
+                self.zip_file.writestr(name, template.read(name))
+            self.content_types = etree.fromstring(template.read('[Content_Types].xml'))
+            self.rels = etree.fromstring(template.read('word/_rels/document.xml.rels'))
+
+        rel_ids = [int(rel.get('Id')[3:]) for rel in self.rels if rel.get('Id', '').startswith('rId')]
+        self.next_rel_id = max(rel_ids, default=0) + 1
+        self.extensions = {item.get('Extension') for item in self.content_types
+                           if item.tag == f'{{{TYPES_NS}}}Default'}
+
+        # 用python-docx生成一行空表格，拆出文档开头、单元格和结尾的XML，保证和DocxWriter生成的表格一致
+        document = Document()
+        document.add_table(rows=1, cols=cols)
+        xml = etree.tostring(document.element, encoding='unicode')
+        row_start = xml.index('<w:tr')
+        row_end = xml.index('</w:tr>') + len('</w:tr>')
+        row_xml = xml[row_start:row_end]
+        self.head = xml[:row_start]
+        self.tail = xml[row_end:]
+        self.row_open = row_xml[:row_xml.index('<w:tc')]
+        self.cell_heads = row_xml[row_xml.index('<w:tc'):-len('</w:tr>')].split('</w:tc>')[:-1]
+
+        self.write("<?xml version='1.0' encoding='UTF-8' standalone='yes'?>\n")
+        self.write(self.head)
+
+    def write(self, text):
+        self.body.write(text.encode('utf-8'))
+
+    def write_cell(self, content=''):
+        col = self.index % self.cols
+        if col == 0:
+            self.write(self.row_open)
+        self.write(self.cell_heads[col] + content + '</w:tc>')
+        if col == self.cols - 1:
+            self.write('</w:tr>')
+        self.index += 1
+
+    def add_picture(self, image):
+        blob, filename = read_image(image)
+        image_info = DocxImage.from_blob(blob)
+        number = self.index + 1
+
+        digest = hashlib.sha1(blob).hexdigest()
+        rel_id = self.media.get(digest)
+        if rel_id is None:
+            # 图片数据直接写入压缩包，不在内存中保留
+            partname = f'media/image{len(self.media) + 1}.{image_info.ext}'
+            self.zip_file.writestr(f'word/{partname}', blob, compress_type=zipfile.ZIP_STORED)
+            if image_info.ext not in self.extensions:
+                etree.SubElement(self.content_types, f'{{{TYPES_NS}}}Default', Extension=image_info.ext,
+                                 ContentType=image_info.content_type)
+                self.extensions.add(image_info.ext)
+
+            rel_id = f'rId{self.next_rel_id}'
+            self.next_rel_id += 1
+            etree.SubElement(self.rels, f'{{{RELS_NS}}}Relationship', Id=rel_id, Type=IMAGE_REL_TYPE,
+                             Target=partname)
+            self.media[digest] = rel_id
+
+        name = quoteattr(filename or f'image.{image_info.ext}')
+        self.write_cell(PICTURE_XML.format(cx=self.cx, cy=self.cy, shape_id=number, name=name, rel_id=rel_id))
+
+    def save(self):
+        # 补齐最后一行以及预设行数中剩余的空单元格
+        while self.index % self.cols or self.index < self.rows * self.cols:
+            self.write_cell()
+        self.write(self.tail)
+
+        self.body.seek(0)
+        with self.zip_file.open('word/document.xml', 'w', force_zip64=True) as f:
+            shutil.copyfileobj(self.body, f)
+        self.body.close()
+        self.zip_file.writestr('word/_rels/document.xml.rels',
+                               etree.tostring(self.rels, xml_declaration=True, encoding='UTF-8', standalone=True))
+        self.zip_file.writestr('[Content_Types].xml',
+                               etree.tostring(self.content_types, xml_declaration=True, encoding='UTF-8',
+                                              standalone=True))
+        self.zip_file.close()
+        os.replace(self.temp_path, self.docx_path)
+
+    def abort(self):
+        # 放弃未完成的文档，删除临时文件；可以重复调用，已保存的文档不受影响
+        try:
+            self.body.close()
+            self.zip_file.close()
+        finally:
+            try:
+                os.remove(self.temp_path)
+            except FileNotFoundError:
+                pass
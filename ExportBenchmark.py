@@ -0,0 +1,182 @@
+import argparse
+import hashlib
+import json
+import multiprocessing
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from PIL import Image
+
+# 导出性能测试：生成可重复的测试图片文件夹，分别测试两个Word工具和Excel工具的耗时、速度、峰值内存和输出大小
+CASES = ('word', 'itw', 'excel')
+TREE_MARKER = '.benchmark_tree.json'
+
+
+def generate_tree(root, folders, images, sizes, formats, seed):
+    # 按随机种子生成测试图片，参数相同时直接复用已经生成的文件夹
+    # 只删除空文件夹或之前生成的测试文件夹，指定了其他已有文件夹时报错，不删除其中的文件
+    params = {'folders': folders, 'images': images, 'sizes': sizes, 'formats': formats, 'seed': seed}
+    marker = os.path.join(root, TREE_MARKER)
+    try:
+        with open(marker, encoding='utf-8') as f:
+            if json.load(f) == params:
+                return
+    except (OSError, ValueError):
+        pass
+
+    if os.path.exists(marker):
+        shutil.rmtree(root)
+    elif os.path.isdir(root) and os.listdir(root):
+        raise ValueError(f'{root} 不是测试图片文件夹且不为空，请指定空文件夹或新的路径')
+    os.makedirs(root, exist_ok=True)
+    # 先写入空的标记，生成中途退出时下次仍可以删除重新生成
+    with open(marker, 'w', encoding='utf-8') as f:
+        json.dump({}, f)
+    rng = random.Random(seed)
+    for folder in range(folders):
+        folder_path = os.path.join(root, f'folder{folder:03d}')
+        os.makedirs(folder_path)
+        for index in range(images):
+            width, height = rng.choice(sizes)
+            image_format = rng.choice(formats)
+            # 随机小图放大后得到平滑变化的内容，压缩后的文件大小接近真实照片
+            small = Image.frombytes('RGB', (32, 24), rng.randbytes(32 * 24 * 3))
+            image = small.resize((width, height), Image.BICUBIC)
+            image_path = os.path.join(folder_path, f'img{index:04d}.{image_format}')
+            if image_format == 'jpg':
+                image.save(image_path, quality=90)
+            else:
+                image.save(image_path)
+
+    with open(marker, 'w', encoding='utf-8') as f:
+        json.dump(params, f)
+
+
+def peak_rss_mb():
+    # 本进程和进程池子进程的峰值内存；Windows没有resource模块，返回None
+    try:
+        import resource
+    except ImportError:
+        return None
+    scale = 1024 ** 2 if sys.platform == 'darwin' else 1024
+    return {'self': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale,
+            'children': resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / scale}
+
+
+def folder_bytes(path):
+    return sum(os.path.getsize(os.path.join(dirpath, name)) for dirpath, _, names in os.walk(path) for name in names)
+
+
+def run_case(case, input_folder, output_folder, jobs, use_cache):
+    # 在单独的进程中运行，峰值内存只包含这一项测试
+    start = time.perf_counter()
+    if case == 'word':
+        try:
+            from .ImportingPicturesIntoWord import Worker
+        except ImportError:
+            from ImportingPicturesIntoWord import Worker
+        Worker(input_folder, output_folder, 60, 2, 2000, 1500, 7.51, 5.64, jobs=jobs, use_cache=use_cache,
+               incremental=False).run()
+    elif case == 'itw':
+        try:
+            from .ITW import Worker
+        except ImportError:
+            from ITW import Worker
+        Worker(input_folder, output_folder, jobs=jobs, use_cache=use_cache, incremental=False).run()
+    else:
+        try:
+            from .跳转1 import insert_images_to_excel
+        except ImportError:
+            from 跳转1 import insert_images_to_excel
+        insert_images_to_excel(input_folder, output_folder, lambda progress: None, use_cache=use_cache)
+    return {'wall': time.perf_counter() - start, 'peak_rss_mb': peak_rss_mb()}
+
+
+def benchmark(case, input_folder, total_images, jobs, use_cache):
+    output_folder = tempfile.mkdtemp(prefix=f'benchmark_{case}_')
+    try:
+        command = [sys.executable, os.path.abspath(__file__), '--run-case', case, '--in', input_folder,
+                   '--out', output_folder, '--jobs', str(jobs)]
+        if use_cache:
+            command.append('--cache')
+        output = subprocess.run(command, capture_output=True, text=True, check=True).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        result.update({'case': case, 'images': total_images, 'images_per_second': total_images / result['wall'],
+                       'output_bytes': folder_bytes(output_folder)})
+        return result
+    finally:
+        shutil.rmtree(output_folder, ignore_errors=True)
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def parse_size(text):
+    width, height = text.lower().split('x')
+    return [int(width), int(height)]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Word/Excel导出性能测试')
+    parser.add_argument('--tree', default=os.path.join(tempfile.gettempdir(), 'image_export_benchmark'),
+                        help='测试图片文件夹，参数不变时重复使用')
+    parser.add_argument('--folders', type=int, default=10, help='子文件夹数量')
+    parser.add_argument('--images', type=int, default=20, help='每个子文件夹的图片数量')
+    parser.add_argument('--sizes', type=parse_size, nargs='+', default=[[4000, 3000], [3000, 4000], [1600, 1200]],
+                        metavar='WxH', help='图片尺寸，随机选用')
+    parser.add_argument('--formats', nargs='+', default=['jpg'], choices=['jpg', 'png'], help='图片格式，随机选用')
+    parser.add_argument('--seed', type=int, default=0, help='随机种子')
+    parser.add_argument('--cases', nargs='+', default=list(CASES), choices=CASES, help='测试项目')
+    parser.add_argument('--jobs', type=int, default=os.cpu_count() or 1, help='并行处理进程数')
+    parser.add_argument('--cache', action='store_true', help='使用压缩结果缓存（默认关闭，测试完整的处理时间）')
+    parser.add_argument('--json', default=None, help='把测试结果写入JSON文件')
+    parser.add_argument('--run-case', choices=CASES, help=argparse.SUPPRESS)
+    parser.add_argument('--in', dest='input', help=argparse.SUPPRESS)
+    parser.add_argument('--out', dest='output', help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.run_case:
+        print(json.dumps(run_case(args.run_case, args.input, args.output, args.jobs, args.cache)))
+        return 0
+
+    try:
+        generate_tree(args.tree, args.folders, args.images, args.sizes, args.formats, args.seed)
+    except ValueError as e:
+        parser.error(str(e))
+    total_images = args.folders * args.images
+    report = {'commit': git_commit(), 'python': sys.version.split()[0], 'platform': platform.platform(),
+              'cpu_count': os.cpu_count(), 'jobs': args.jobs, 'cache': args.cache,
+              'tree': {'folders': args.folders, 'images': args.images, 'sizes': args.sizes, 'formats': args.formats,
+                       'seed': args.seed, 'bytes': folder_bytes(args.tree)},
+              'results': []}
+    # 测试图片参数的摘要，方便比较不同提交时确认使用的是同一组图片
+    report['tree']['id'] = hashlib.sha1(json.dumps(report['tree'], sort_keys=True).encode('utf-8')).hexdigest()[:12]
+
+    for case in args.cases:
+        result = benchmark(case, args.tree, total_images, args.jobs, args.cache)
+        report['results'].append(result)
+        rss = result['peak_rss_mb']
+        rss_text = f"{max(rss['self'], rss['children']):.0f} MB" if rss else '--'
+        print(f"{case:6s} {result['wall']:8.2f} 秒 {result['images_per_second']:7.1f} 张/秒 "
+              f"峰值内存 {rss_text} 输出 {result['output_bytes'] / 1024 ** 2:.1f} MB")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    multiprocessing.freeze_support()
+    sys.exit(main())
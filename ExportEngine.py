@@ -0,0 +1,638 @@
+import argparse
+import io
+import multiprocessing
+import os
+import queue
+import sys
+import threading
+import time
+from collections import deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+
+try:
+    from .ImageResize import DEFAULT_PIXEL_BUDGET, DEFAULT_PIXEL_LIMIT, SharedPixelBudget, cm_to_pixels, decode_pixels, \
+        default_jobs, needs_resize, parallel_map, read_headers, resize_image, resize_image_for_print, \
+        resize_image_to_bytes, set_pixel_limit, target_sizes
+    from .ResizeCache import cached_map
+    from .ContentHash import content_keys, copy_result, expand_duplicates, first_occurrences
+    from .BuildManifest import BuildManifest
+    from .DocxWriter import DocxWriter, StreamingDocxWriter
+    from .XlsxWriter import StreamingXlsxWriter, XlsxWriter
+    from .ExportProgress import ProgressTracker
+    from .FolderIndex import scan
+    from .ImagePrefetch import DEFAULT_PREFETCH_BYTES, DEFAULT_PREFETCH_DEPTH, prefetcher
+    from .RunReport import RunReport
+except ImportError:
+    from ImageResize import DEFAULT_PIXEL_BUDGET, DEFAULT_PIXEL_LIMIT, SharedPixelBudget, cm_to_pixels, decode_pixels, \
+        default_jobs, needs_resize, parallel_map, read_headers, resize_image, resize_image_for_print, \
+        resize_image_to_bytes, set_pixel_limit, target_sizes
+    from ResizeCache import cached_map
+    from ContentHash import content_keys, copy_result, expand_duplicates, first_occurrences
+    from BuildManifest import BuildManifest
+    from DocxWriter import DocxWriter, StreamingDocxWriter
+    from XlsxWriter import StreamingXlsxWriter, XlsxWriter
+    from ExportProgress import ProgressTracker
+    from FolderIndex import scan
+    from ImagePrefetch import DEFAULT_PREFETCH_BYTES, DEFAULT_PREFETCH_DEPTH, prefetcher
+    from RunReport import RunReport
+
+# 不依赖PyQt5的导出引擎，界面中的Worker和命令行都调用这里的函数
+
+# Excel表格每行5张图片，图片显示尺寸（像素）
+EXCEL_COLS = 5
+EXCEL_IMAGE_WIDTH = 903 // 6 * 2.3
+EXCEL_IMAGE_HEIGHT = 677 // 6 * 2.3
+
+# 文档的表格排版和拆分设置，按文件夹并行时需要传给子进程
+WordLayout = namedtuple('WordLayout', ['writer_class', 'rows', 'cols', 'image_width', 'image_height',
+                                       'max_part_images', 'max_part_bytes'])
+
+
+class ExportControl:
+    # 暂停/继续/取消控制，处理线程在每个检查点调用wait_if_paused
+    def __init__(self, cancel_check=None):
+        # 未暂停时为set状态，暂停时clear，处理线程在检查点等待
+        self.resume_event = threading.Event()
+        self.resume_event.set()
+        self.cancelled = False
+        self.cancel_check = cancel_check
+
+    def pause(self):
+        self.resume_event.clear()
+
+    def resume(self):
+        self.resume_event.set()
+
+    def is_paused(self):
+        return not self.resume_event.is_set()
+
+    def cancel(self):
+        # 取消时同时唤醒暂停中的线程，让它尽快退出
+        self.cancelled = True
+        self.resume_event.set()
+
+    def is_cancelled(self):
+        if self.cancel_check and self.cancel_check():
+            self.cancelled = True
+        return self.cancelled
+
+    def wait_if_paused(self):
+        # 暂停时在这里等待继续，返回是否已取消
+        self.resume_event.wait()
+        return self.is_cancelled()
+
+
+def word_settings(rows, cols, new_width, new_height, image_width, image_height, dpi, quality, fast_decode,
+                  keep_ratio, max_part_images, max_part_mb):
+    # 影响输出文档内容的设置，任何一项变化都需要重新生成全部文档
+    return {'rows': rows, 'cols': cols, 'new_width': new_width, 'new_height': new_height,
+            'image_width': image_width, 'image_height': image_height, 'dpi': dpi, 'quality': quality,
+            'fast_decode': fast_decode, 'keep_ratio': keep_ratio, 'max_part_images': max_part_images,
+            'max_part_mb': max_part_mb}
+
+
+def part_path(output_folder, name, number):
+    # 拆分后的文档按 文件夹名_part01.docx、_part02.docx 依次命名
+    return os.path.join(output_folder, f'{name}_part{number:02d}.docx')
+
+
+def remove_stale_parts(output_folder, name, part_count):
+    # 删除之前生成、这次不再需要的文档：拆分时删除未拆分的文档，未拆分时删除所有部分，以及多出来的部分
+    stale = [os.path.join(output_folder, f'{name}.docx')] if part_count > 1 else []
+    number = part_count + 1 if part_count > 1 else 1
+    while os.path.exists(part_path(output_folder, name, number)):
+        stale.append(part_path(output_folder, name, number))
+        number += 1
+    for path in stale:
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def export_word(root_folder, output_folder, rows, cols, new_width, new_height, image_width, image_height,
+                jobs=None, keep_originals=True, dpi=None, quality=85, fast_decode=True, use_cache=True,
+                incremental=True, streaming=False, keep_ratio=True, progress_callback=None, control=None, plan=None,
+                pixel_budget=DEFAULT_PIXEL_BUDGET, pixel_limit=DEFAULT_PIXEL_LIMIT, max_part_images=None,
+                max_part_mb=None, per_folder=False, report=False, profile=False, prefetch=DEFAULT_PREFETCH_DEPTH,
+                prefetch_mb=DEFAULT_PREFETCH_BYTES // 1024 ** 2):
+    # 每个子文件夹生成一个Word文档，图片按顺序插入表格；全部完成返回True，被取消返回False
+    # 设置了max_part_images或max_part_mb时，超出的图片拆分到多个文档中
+    # per_folder为True时每个进程负责整个子文件夹，适合子文件夹很多、每个文件夹图片不多的任务
+    # report为True时在输出文件夹中写入各阶段耗时报告，profile为True时同时保存cProfile结果
+    # prefetch为提前读取的图片数，已读取未处理的数据不超过prefetch_mb；为0时不预读
+    run_report = RunReport(report, profile)
+    with run_report.profiling() as profiler:
+        finished = build_word_documents(root_folder, output_folder, rows, cols, new_width, new_height, image_width,
+                                        image_height, jobs, keep_originals, dpi, quality, fast_decode, use_cache,
+                                        incremental, streaming, keep_ratio, progress_callback, control, plan,
+                                        pixel_budget, pixel_limit, max_part_images, max_part_mb, per_folder,
+                                        prefetch, prefetch_mb * 1024 ** 2, run_report)
+    run_report.write(output_folder, finished, profiler)
+    return finished
+
+
+def build_word_documents(root_folder, output_folder, rows, cols, new_width, new_height, image_width, image_height,
+                         jobs, keep_originals, dpi, quality, fast_decode, use_cache, incremental, streaming,
+                         keep_ratio, progress_callback, control, plan, pixel_budget, pixel_limit, max_part_images,
+                         max_part_mb, per_folder, prefetch, prefetch_bytes, run_report):
+    jobs = jobs or default_jobs()
+    control = control or ExportControl()
+    set_pixel_limit(pixel_limit)
+
+    # 一次扫描得到所有层级子文件夹中的图片及其大小，进度总量也由扫描结果得出
+    with run_report.stage('scan'):
+        plan = plan or scan(root_folder)
+
+    # 进度按图片字节数计算，回调频率限制在每秒10次以内
+    progress = ProgressTracker(plan.total_images, plan.total_bytes, progress_callback or (lambda p: None))
+
+    # 增量生成：读取输出文件夹中的生成记录，跳过图片和设置都没有变化的子文件夹
+    settings = word_settings(rows, cols, new_width, new_height, image_width, image_height, dpi, quality,
+                             fast_decode, keep_ratio, max_part_images, max_part_mb)
+    manifest = BuildManifest(output_folder, settings) if incremental else None
+    if manifest:
+        dirty_folders = []
+        for folder in plan.folders:
+            docx_path = os.path.join(output_folder, f'{folder.name}.docx')
+            if not os.path.exists(docx_path):
+                docx_path = part_path(output_folder, folder.name, 1)
+            if manifest.is_current(folder, docx_path):
+                progress.skip(sum(image.size for image in folder.images), len(folder.images))
+                run_report.skip(len(folder.images))
+            else:
+                dirty_folders.append(folder)
+        plan = plan._replace(folders=tuple(dirty_folders))
+
+    # 修改图片尺寸的工作交给进程池并行完成，结果按原顺序返回
+    # 保留原图时压缩结果只编码到内存中，直接插入文档
+    image_paths = plan.image_paths()
+    in_memory = keep_originals or dpi
+    # 先只读取文件头，用于判断尺寸是否需要变化以及估算解码占用的内存
+    with run_report.stage('headers'):
+        headers = read_headers(image_paths, jobs)
+    if dpi:
+        # 按打印分辨率由单元格尺寸计算像素大小，结果编码为JPEG
+        width_px, height_px = cm_to_pixels(image_width, dpi), cm_to_pixels(image_height, dpi)
+        resize = partial(resize_image_for_print, width_px=width_px, height_px=height_px, quality=quality,
+                         fast_decode=fast_decode)
+        sizes = target_sizes(headers, width_px, height_px, keep_ratio=False)
+        changed = [True] * len(image_paths)
+    else:
+        if keep_originals:
+            resize = partial(resize_image_to_bytes, new_width=new_width, new_height=new_height,
+                             keep_ratio=keep_ratio, fast_decode=fast_decode)
+        else:
+            resize = partial(resize_image, new_width=new_width, new_height=new_height, keep_ratio=keep_ratio,
+                             fast_decode=fast_decode)
+        # 尺寸不需要变化的图片直接插入原文件，不解码也不重新编码
+        sizes = target_sizes(headers, new_width, new_height, keep_ratio)
+        changed = needs_resize(headers, new_width, new_height, keep_ratio)
+
+    # 按文件头估算每张图片解码时占用的像素数，同时解码的总量不超过pixel_budget，超大图片单独处理
+    costs = [decode_pixels(header, size, fast_decode) for header, size, change in zip(headers, sizes, changed)
+             if change]
+    images = [image for folder in plan.folders for image in folder.images]
+    passthrough_paths = [image.path for image, change in zip(images, changed) if not change]
+    resize_images = [image for image, change in zip(images, changed) if change]
+
+    # 流式写入时图片处理完立即写入文件，内存占用不随图片数量增长
+    writer_class = StreamingDocxWriter if streaming else DocxWriter
+    # 拆分时每部分预设的行数不超过一部分图片所需的行数，避免中间的部分留下空行
+    part_rows = min(rows, -(-max_part_images // cols)) if max_part_images else rows
+    layout = WordLayout(writer_class, part_rows, cols, image_width, image_height, max_part_images,
+                        max_part_mb * 1024 ** 2 if max_part_mb else None)
+
+    if per_folder:
+        # 按文件夹并行时每个进程独立压缩图片并生成文档，不使用下面的图片级并行
+        return export_folders_parallel(plan, changed, costs, resize, in_memory, use_cache, output_folder, layout,
+                                       jobs, pixel_limit, pixel_budget, prefetch, prefetch_bytes, progress, control,
+                                       manifest, run_report)
+
+    # 在后台线程中提前读取图片文件，压缩和插入文档时不再等待读取；覆盖原图时压缩进程需要原文件路径，只预读直接插入的图片
+    read_ahead = prefetcher(images, prefetch, prefetch_bytes)
+    passthrough = read_ahead(passthrough_paths) if read_ahead else None
+
+    # 记录耗时时，各图片压缩阶段的耗时按顺序放入队列，插入文档时依次取出
+    timings = deque() if run_report.enabled else None
+    on_timings = timings.append if run_report.enabled else None
+    resized_images = resize_all(resize, resize_images, jobs, in_memory, use_cache, costs, pixel_budget, on_timings,
+                                read_ahead, run_report)
+
+    changed = iter(changed)
+    try:
+        for folder in plan.folders:
+            # 每个文档开始前检查是否暂停或取消
+            if control.wait_if_paused():
+                return False
+
+            images = folder_images(folder, changed, resized_images, in_memory, timings, passthrough)
+            if not write_folder(folder, images, output_folder, layout, control.wait_if_paused, progress.advance,
+                                run_report):
+                return False
+            if manifest:
+                manifest.mark_done(folder, restat=not in_memory)
+    finally:
+        # 提前结束时停止还在进行的压缩和预读
+        resized_images.close()
+        if passthrough:
+            passthrough.close()
+
+    progress.finish()
+    return True
+
+
+def export_folders_parallel(plan, changed, costs, resize, in_memory, use_cache, output_folder, layout, jobs,
+                            pixel_limit, pixel_budget, prefetch, prefetch_bytes, progress, control, manifest,
+                            run_report):
+    # 每个子文件夹交给一个进程完成，图片最多的文件夹先开始，缩短最后一个文件夹完成的时间
+    # 各进程通过队列回传进度，暂停和取消通过共享的Event传给各进程
+    # 各进程共享同一个像素预算，同时解码的像素总数不超过pixel_budget，超大图片不会在多个进程中同时解码
+    changed_by_folder = {}
+    costs_by_folder = {}
+    changed = iter(changed)
+    costs = iter(costs)
+    for folder in plan.folders:
+        changed_by_folder[folder.key] = [next(changed) for _ in folder.images]
+        costs_by_folder[folder.key] = [next(costs) for change in changed_by_folder[folder.key] if change]
+    folders = sorted(plan.folders, key=lambda folder: sum(image.size for image in folder.images), reverse=True)
+    # 各进程分别预读，按同时运行的进程数平分预读数据量上限，总量仍不超过prefetch_bytes
+    prefetch_bytes //= max(min(jobs, len(folders)), 1)
+
+    with multiprocessing.Manager() as manager:
+        progress_queue = manager.Queue()
+        resume_event = manager.Event()
+        resume_event.set()
+        cancel_event = manager.Event()
+        budget = SharedPixelBudget(manager, pixel_budget) if pixel_budget else None
+
+        def forward_progress(timeout):
+            # 转发各进程回传的进度，最多等待timeout秒
+            try:
+                progress.advance(progress_queue.get(timeout=timeout))
+                while True:
+                    progress.advance(progress_queue.get_nowait())
+            except queue.Empty:
+                pass
+
+        executor = ProcessPoolExecutor(max_workers=jobs, initializer=set_pixel_limit, initargs=(pixel_limit,))
+        pending = set()
+        try:
+            futures = {executor.submit(build_folder, folder, changed_by_folder[folder.key],
+                                       costs_by_folder[folder.key], budget, resize, in_memory, use_cache,
+                                       output_folder, layout, prefetch, prefetch_bytes, progress_queue, resume_event,
+                                       cancel_event, run_report.enabled): folder for folder in folders}
+            pending = set(futures)
+            while pending and not control.is_cancelled():
+                # 同步暂停状态
+                if control.is_paused():
+                    resume_event.clear()
+                else:
+                    resume_event.set()
+
+                forward_progress(0.1)
+                for future in [future for future in pending if future.done()]:
+                    pending.remove(future)
+                    # 子进程中记录的耗时合并到本次的报告中
+                    finished, report_data = future.result()
+                    run_report.merge(report_data)
+                    if finished and manifest:
+                        manifest.mark_done(futures[future], restat=not in_memory)
+            forward_progress(0)
+        finally:
+            # 出错或取消时通知各进程停止，丢弃还没开始的文件夹
+            if pending:
+                cancel_event.set()
+            resume_event.set()
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    if pending:
+        return False
+    progress.finish()
+    return True
+
+
+def build_folder(folder, changed, costs, budget, resize, in_memory, use_cache, output_folder, layout, prefetch,
+                 prefetch_bytes, progress_queue, resume_event, cancel_event, report):
+    # 在子进程中运行：逐张压缩一个子文件夹的图片并生成文档
+    # 返回是否完成（被取消为False）和这个文件夹的耗时记录
+    def wait_if_paused():
+        resume_event.wait()
+        return cancel_event.is_set()
+
+    run_report = RunReport(report)
+    timings = deque() if report else None
+    on_timings = timings.append if report else None
+    read_ahead = prefetcher(folder.images, prefetch, prefetch_bytes)
+    passthrough = read_ahead([image.path for image, change in zip(folder.images, changed) if not change]) \
+        if read_ahead else None
+    resize_images = [image for image, change in zip(folder.images, changed) if change]
+    # 解码前从共享预算中申请，其他进程正在解码大图时等待
+    resized_images = resize_all(resize, resize_images, 1, in_memory, use_cache, costs, budget, on_timings,
+                                read_ahead, run_report)
+    images = folder_images(folder, iter(changed), resized_images, in_memory, timings, passthrough)
+    finished = write_folder(folder, images, output_folder, layout, wait_if_paused, progress_queue.put, run_report)
+    return finished, run_report.data()
+
+
+def resize_all(resize, images, jobs, in_memory, use_cache, costs=None, budget=None, on_timings=None, read_ahead=None,
+               run_report=None):
+    # 按顺序返回images中每张图片的压缩结果，参数与parallel_map相同
+    # 内容完全相同的图片只压缩一次，其余直接使用第一张的结果；保留原图时优先从缓存中读取之前压缩过的结果
+    # 查找相同图片的耗时记入run_report的hash阶段
+    with (run_report or RunReport()).stage('hash'):
+        keys = content_keys(images, jobs)
+    first = first_occurrences(keys)
+    unique = [image for image, is_first in zip(images, first) if is_first]
+    image_paths = [image.path for image in unique]
+    if costs:
+        costs = [cost for cost, is_first in zip(costs, first) if is_first]
+
+    if in_memory and use_cache:
+        stats = [(image.size, image.mtime_ns) for image in unique]
+        results = cached_map(resize, image_paths, jobs, stats=stats, costs=costs, budget=budget,
+                             on_timings=on_timings, prefetch=read_ahead)
+    else:
+        if in_memory and read_ahead:
+            image_paths = read_ahead(image_paths)
+        results = parallel_map(resize, image_paths, jobs, costs, budget, on_timings)
+    # 覆盖原图时重复的图片也要写入压缩结果
+    return expand_duplicates(results, keys, [image.path for image in images], None if in_memory else copy_result,
+                             on_timings)
+
+
+def folder_images(folder, changed, resized_images, in_memory, timings=None, passthrough=None):
+    # 按顺序给出每张图片插入文档的内容和图片数据大小，尺寸不变的图片直接使用原文件
+    # timings为压缩结果对应的耗时队列，不为None时每张图片同时给出各阶段耗时，否则为None
+    # passthrough为尺寸不变的图片预读的文件内容，没有预读时由插入文档时读取
+    for entry in folder.images:
+        start = time.perf_counter()
+        change = next(changed)
+        if not change:
+            image = io.BytesIO(next(passthrough)[1]) if passthrough else entry.path
+            nbytes = entry.size
+        elif in_memory:
+            data = next(resized_images)
+            image, nbytes = io.BytesIO(data), len(data)
+        else:
+            image = next(resized_images)
+            nbytes = os.path.getsize(image)
+
+        stages = None
+        if timings is not None:
+            stages = timings.popleft() if change else {'passthrough': 1}
+            # 等待压缩结果的时间，压缩跟不上写入时这一项会变大
+            stages['wait'] = time.perf_counter() - start
+        yield entry, image, nbytes, stages
+
+
+def saving_path(docx_path):
+    # 文档先保存为临时文件，整个子文件夹完成后再改为正式文件名
+    return f'{docx_path}.saving'
+
+
+def save_document(writer, images, nbytes):
+    # 返回图片数、图片数据量和保存耗时，改为正式文件名后再记入报告
+    start = time.perf_counter()
+    writer.save()
+    return images, nbytes, time.perf_counter() - start
+
+
+def discard_parts(writers):
+    # 取消或出错时删除这个子文件夹所有部分的临时文件，包括已经保存完成的部分；之前生成的文档保持不变
+    for writer in writers:
+        writer.abort()
+        if os.path.exists(writer.docx_path):
+            os.remove(writer.docx_path)
+
+
+def write_folder(folder, images, output_folder, layout, wait_if_paused, advance, run_report):
+    # 把一个子文件夹的图片写入文档，达到每部分的上限时拆分；全部保存后返回True，被取消返回False
+    # 各部分都保存完成后才一起改为正式文件名，取消或出错时不会留下一部分新文档和之前的文档混在一起
+    targets = [os.path.join(output_folder, f'{folder.name}.docx')]
+    writer = layout.writer_class(saving_path(targets[0]), layout.rows, layout.cols, layout.image_width,
+                                 layout.image_height)
+    writers = [writer]
+    saves = []
+    part_images = 0
+    part_bytes = 0
+    cancelled = False
+
+    try:
+        # 拆分出的前一部分在后台线程中保存，同时继续生成下一部分；退出线程池时等待后台保存结束
+        with ThreadPoolExecutor(max_workers=2) as save_pool:
+            for entry, image, nbytes, stages in images:
+                # 每张图片之前检查是否暂停或取消，取消时丢弃这个子文件夹的所有部分
+                if wait_if_paused():
+                    cancelled = True
+                    break
+
+                # 达到每部分的图片数或大小上限时开始下一部分，只在整行结束处拆分，保证表格排版连续
+                if part_images and part_images % layout.cols == 0 and (
+                        (layout.max_part_images and part_images >= layout.max_part_images) or
+                        (layout.max_part_bytes and part_bytes + nbytes > layout.max_part_bytes)):
+                    if not saves:
+                        targets[0] = part_path(output_folder, folder.name, 1)
+                        writer.docx_path = saving_path(targets[0])
+                    # 最多同时保存两部分，避免生成速度快于保存时内存中堆积过多文档
+                    if len(saves) >= 2:
+                        saves[-2].result()
+                    saves.append(save_pool.submit(save_document, writer, part_images, part_bytes))
+                    targets.append(part_path(output_folder, folder.name, len(saves) + 1))
+                    writer = layout.writer_class(saving_path(targets[-1]), layout.rows, layout.cols,
+                                                 layout.image_width, layout.image_height)
+                    writers.append(writer)
+                    part_images = 0
+                    part_bytes = 0
+
+                # 将图片插入表格
+                start = time.perf_counter()
+                writer.add_picture(image)
+                if stages is not None:
+                    stages['add_picture'] = time.perf_counter() - start
+                    run_report.add_image(entry.path, entry.size, nbytes, stages)
+                part_images += 1
+                part_bytes += nbytes
+
+                advance(entry.size)
+
+            if not cancelled:
+                # 保存最后一部分，等待所有部分保存完成
+                saves.append(save_pool.submit(save_document, writer, part_images, part_bytes))
+                for save in saves:
+                    save.result()
+    except BaseException:
+        discard_parts(writers)
+        raise
+    if cancelled:
+        discard_parts(writers)
+        return False
+
+    for writer, target, save in zip(writers, targets, saves):
+        os.replace(writer.docx_path, target)
+        run_report.add_document(target, *save.result())
+    remove_stale_parts(output_folder, folder.name, len(saves))
+    return True
+
+
+def export_excel(image_folder, output_folder, fast_decode=True, use_cache=True, progress_callback=None,
+                 control=None, plan=None, pixel_limit=DEFAULT_PIXEL_LIMIT, report=False, profile=False,
+                 prefetch=DEFAULT_PREFETCH_DEPTH, prefetch_mb=DEFAULT_PREFETCH_BYTES // 1024 ** 2, streaming=True,
+                 jobs=None, pixel_budget=DEFAULT_PIXEL_BUDGET):
+    # 每个子文件夹生成一个Excel文件，图片每行5张；全部完成返回True，被取消返回False
+    # 图片由jobs个进程并行压缩，同时解码的像素总数不超过pixel_budget，超大图片按缩小后的分辨率解码
+    # streaming为True时图片处理完立即写入文件，内存占用不随图片数量增长；为False时使用openpyxl生成
+    # report、profile、prefetch和prefetch_mb与export_word相同
+    run_report = RunReport(report, profile)
+    with run_report.profiling() as profiler:
+        finished = build_excel_files(image_folder, output_folder, fast_decode, use_cache, progress_callback, control,
+                                     plan, pixel_limit, prefetch, prefetch_mb * 1024 ** 2, streaming,
+                                     jobs or default_jobs(), pixel_budget, run_report)
+    run_report.write(output_folder, finished, profiler)
+    return finished
+
+
+def build_excel_files(image_folder, output_folder, fast_decode, use_cache, progress_callback, control, plan,
+                      pixel_limit, prefetch, prefetch_bytes, streaming, jobs, pixel_budget, run_report):
+    control = control or ExportControl()
+    set_pixel_limit(pixel_limit)
+
+    # 一次扫描得到第一层子文件夹中的图片及其大小，进度总量也由扫描结果得出
+    with run_report.stage('scan'):
+        plan = plan or scan(image_folder, recursive=False)
+
+    # 进度按图片字节数计算，回调频率限制在每秒10次以内
+    progress = ProgressTracker(plan.total_images, plan.total_bytes, progress_callback or (lambda p: None))
+
+    # 将图片按原比例缩小到不超过宽2000，高1500像素，只编码到内存中，不覆盖原图
+    resize = partial(resize_image_to_bytes, new_width=2000, new_height=1500, fast_decode=fast_decode)
+    writer_class = StreamingXlsxWriter if streaming else XlsxWriter
+
+    for folder in plan.folders:
+        # 先只读取文件头，尺寸不需要变化的图片直接插入原文件
+        with run_report.stage('headers'):
+            headers = read_headers([image.path for image in folder.images], jobs)
+        changed = needs_resize(headers, 2000, 1500)
+        resize_images = [image for image, change in zip(folder.images, changed) if change]
+        costs = [decode_pixels(header, size, fast_decode)
+                 for header, size, change in zip(headers, target_sizes(headers, 2000, 1500), changed) if change]
+
+        # 在后台线程中提前读取后面的图片文件
+        read_ahead = prefetcher(folder.images, prefetch, prefetch_bytes)
+        passthrough = read_ahead([image.path for image, change in zip(folder.images, changed) if not change]) \
+            if read_ahead else None
+
+        # 内容相同的图片只压缩一次，优先从缓存中读取之前压缩过的结果
+        timings = deque() if run_report.enabled else None
+        on_timings = timings.append if run_report.enabled else None
+        resized_images = resize_all(resize, resize_images, jobs, True, use_cache, costs, pixel_budget, on_timings,
+                                    read_ahead, run_report)
+        images = folder_images(folder, iter(changed), resized_images, True, timings, passthrough)
+        folder_bytes = 0
+
+        # 获取子文件夹名称作为Excel文件的名称，列宽和行高在创建时一次确定
+        excel_file = f"{output_folder}/{folder.name}.xlsx"
+        writer = writer_class(excel_file, EXCEL_COLS, EXCEL_IMAGE_WIDTH, EXCEL_IMAGE_HEIGHT)
+        # 中途出错时同样丢弃当前未完成的Excel文件，不留下临时文件
+        try:
+            for entry, image, nbytes, stages in images:
+                # 收到取消请求时停止，当前子文件夹的Excel文件不保存
+                if control.wait_if_paused():
+                    writer.abort()
+                    return False
+
+                # 将图片插入到Excel表格中
+                start = time.perf_counter()
+                writer.add_picture(image)
+                if stages is not None:
+                    stages['add_picture'] = time.perf_counter() - start
+                    run_report.add_image(entry.path, entry.size, nbytes, stages)
+                folder_bytes += nbytes
+
+                # 更新进度条
+                progress.advance(entry.size)
+
+            # 保存Excel文件
+            start = time.perf_counter()
+            writer.save()
+            run_report.add_document(excel_file, len(folder.images), folder_bytes, time.perf_counter() - start)
+        except BaseException:
+            writer.abort()
+            raise
+
+    progress.finish()
+    return True
+
+
+def print_progress(progress):
+    # 命令行中在同一行刷新进度
+    sys.stderr.write(f'\r{progress.percent():3d}% | {progress.status_text()}')
+    sys.stderr.flush()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='图片文件夹批量导出为Word/Excel（无界面）')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    word_parser = subparsers.add_parser('word', help='每个子文件夹生成一个Word文档')
+    word_parser.add_argument('--in', dest='input', required=True, help='图片文件夹')
+    word_parser.add_argument('--out', dest='output', required=True, help='输出文件夹')
+    word_parser.add_argument('--rows', type=int, default=60, help='表格行数')
+    word_parser.add_argument('--cols', type=int, default=2, help='表格列数')
+    word_parser.add_argument('--size', type=int, nargs=2, default=(2000, 1500), metavar=('WIDTH', 'HEIGHT'),
+                             help='图片目标宽高（像素）')
+    word_parser.add_argument('--cell-cm', type=float, nargs=2, default=(7.51, 5.64), metavar=('WIDTH', 'HEIGHT'),
+                             help='插入单元格的图片宽高（厘米）')
+    word_parser.add_argument('--dpi', type=int, default=None, help='打印分辨率，指定后按单元格尺寸计算图片像素')
+    word_parser.add_argument('--quality', type=int, default=85, help='打印分辨率模式下的JPEG质量')
+    word_parser.add_argument('--overwrite', action='store_true', help='压缩结果覆盖原图片文件')
+    word_parser.add_argument('--full', action='store_true', help='重新生成全部文档，不使用增量生成')
+    word_parser.add_argument('--streaming', action='store_true', help='低内存流式写入文档')
+    word_parser.add_argument('--part-images', type=int, default=None, help='每个文档最多插入的图片数，超出时拆分')
+    word_parser.add_argument('--per-folder', action='store_true', help='按文件夹并行，每个进程生成一个文档')
+    word_parser.add_argument('--part-mb', type=float, default=None, help='每个文档最大的图片数据量（MB），超出时拆分')
+
+    excel_parser = subparsers.add_parser('excel', help='每个子文件夹生成一个Excel文件')
+    excel_parser.add_argument('--in', dest='input', required=True, help='图片文件夹')
+    excel_parser.add_argument('--out', dest='output', required=True, help='输出文件夹')
+    excel_parser.add_argument('--no-streaming', action='store_true', help='使用openpyxl在内存中生成表格')
+
+    for sub in (word_parser, excel_parser):
+        sub.add_argument('--jobs', type=int, default=None, help='并行处理进程数，默认为CPU核心数')
+        sub.add_argument('--no-cache', action='store_true', help='不使用压缩结果缓存')
+        sub.add_argument('--no-fast-decode', action='store_true', help='不使用JPEG快速解码')
+        sub.add_argument('--pixel-limit', type=int, default=DEFAULT_PIXEL_LIMIT // 1000000,
+                         help='单张图片像素上限（百万像素），超过时视为解压炸弹报错，0为不限制')
+    for sub in (word_parser, excel_parser):
+        sub.add_argument('--report', action='store_true', help='在输出文件夹中写入各阶段耗时报告（JSON和CSV）')
+        sub.add_argument('--profile', action='store_true', help='同时用cProfile分析主进程，结果保存为.prof文件')
+        sub.add_argument('--prefetch', type=int, default=DEFAULT_PREFETCH_DEPTH,
+                         help='在后台提前读取的图片数，图片在网络共享上时可以加大，0为不预读')
+        sub.add_argument('--prefetch-mb', type=int, default=DEFAULT_PREFETCH_BYTES // 1024 ** 2,
+                         help='提前读取但还没有处理的数据上限（MB）')
+        sub.add_argument('--pixel-budget', type=int, default=DEFAULT_PIXEL_BUDGET // 1000000,
+                         help='同时解码的像素总数上限（百万像素）')
+
+    args = parser.parse_args(argv)
+    os.makedirs(args.output, exist_ok=True)
+    pixel_limit = args.pixel_limit * 1000000 or None
+
+    if args.command == 'word':
+        export_word(args.input, args.output, args.rows, args.cols, args.size[0], args.size[1], args.cell_cm[0],
+                    args.cell_cm[1], jobs=args.jobs, keep_originals=not args.overwrite, dpi=args.dpi,
+                    quality=args.quality, fast_decode=not args.no_fast_decode, use_cache=not args.no_cache,
+                    incremental=not args.full, streaming=args.streaming, progress_callback=print_progress,
+                    pixel_budget=args.pixel_budget * 1000000, pixel_limit=pixel_limit,
+                    max_part_images=args.part_images, max_part_mb=args.part_mb, per_folder=args.per_folder,
+                    report=args.report, profile=args.profile, prefetch=args.prefetch, prefetch_mb=args.prefetch_mb)
+    else:
+        export_excel(args.input, args.output, fast_decode=not args.no_fast_decode, use_cache=not args.no_cache,
+                     progress_callback=print_progress, pixel_limit=pixel_limit, report=args.report,
+                     profile=args.profile, prefetch=args.prefetch, prefetch_mb=args.prefetch_mb,
+                     streaming=not args.no_streaming, jobs=args.jobs, pixel_budget=args.pixel_budget * 1000000)
+    sys.stderr.write('\n')
+    return 0
+
+
+if __name__ == '__main__':
+    multiprocessing.freeze_support()
+    sys.exit(main())
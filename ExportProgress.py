@@ -0,0 +1,70 @@
+import time
+
+
+def format_duration(seconds):
+    seconds = int(seconds)
+    return f'{seconds // 3600:02d}:{seconds // 60 % 60:02d}:{seconds % 60:02d}'
+
+
+class ProgressTracker:
+    # 按图片字节数加权计算进度，并限制回调频率（默认每秒最多10次）
+    def __init__(self, total_images, total_bytes, callback, interval=0.1):
+        self.total_images = total_images
+        self.total_bytes = total_bytes
+        self.callback = callback
+        self.interval = interval
+
+        self.done_images = 0
+        self.done_bytes = 0
+        # 跳过的图片计入进度，但不参与速度计算
+        self.processed_images = 0
+        self.processed_bytes = 0
+        self.start_time = time.monotonic()
+        self.last_report = 0.0
+
+    def advance(self, nbytes, images=1):
+        self.done_images += images
+        self.done_bytes += nbytes
+        self.processed_images += images
+        self.processed_bytes += nbytes
+        self.report()
+
+    def skip(self, nbytes, images):
+        self.done_images += images
+        self.done_bytes += nbytes
+        self.report()
+
+    def report(self, force=False):
+        now = time.monotonic()
+        if force or now - self.last_report >= self.interval:
+            self.last_report = now
+            self.callback(self)
+
+    def finish(self):
+        self.report(force=True)
+
+    def percent(self):
+        if not self.total_bytes:
+            return 100 if self.done_images >= self.total_images else 0
+        return min(100, int(self.done_bytes * 100 / self.total_bytes))
+
+    def elapsed(self):
+        return max(time.monotonic() - self.start_time, 1e-6)
+
+    def images_per_second(self):
+        return self.processed_images / self.elapsed()
+
+    def mb_per_second(self):
+        return self.processed_bytes / self.elapsed() / 1024 ** 2
+
+    def eta(self):
+        # 按已处理的字节速度估算剩余时间，还没有处理任何图片时返回None
+        if not self.processed_bytes:
+            return None
+        return (self.total_bytes - self.done_bytes) / (self.processed_bytes / self.elapsed())
+
+    def status_text(self):
+        eta = self.eta()
+        eta_text = format_duration(eta) if eta is not None else '--:--:--'
+        return (f'{self.done_images}/{self.total_images} 张 | {self.images_per_second():.1f} 张/秒 | '
+                f'{self.mb_per_second():.1f} MB/秒 | 剩余时间 {eta_text}')
@@ -0,0 +1,66 @@
+import os
+from collections import namedtuple
+
+# 支持的图片扩展名，比较时不区分大小写，相机生成的.JPG也能识别
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg')
+
+# 扫描结果全部使用元组，生成后不可修改，各导出工具和进度统计共用同一份
+ImageEntry = namedtuple('ImageEntry', ['name', 'path', 'size', 'mtime_ns'])
+FolderJob = namedtuple('FolderJob', ['name', 'path', 'key', 'images'])
+
+
+class JobPlan(namedtuple('JobPlan', ['root', 'folders'])):
+    __slots__ = ()
+
+    @property
+    def total_images(self):
+        return sum(len(folder.images) for folder in self.folders)
+
+    @property
+    def total_bytes(self):
+        return sum(image.size for folder in self.folders for image in folder.images)
+
+    def image_paths(self):
+        return [image.path for folder in self.folders for image in folder.images]
+
+    def image_stats(self):
+        return [(image.size, image.mtime_ns) for folder in self.folders for image in folder.images]
+
+
+def is_image(name):
+    return name.lower().endswith(IMAGE_EXTENSIONS)
+
+
+def scan_folder(path):
+    # 一次scandir同时得到子文件夹和图片，图片大小和修改时间只stat一次
+    subfolders = []
+    images = []
+    with os.scandir(path) as entries:
+        for entry in entries:
+            if entry.is_dir():
+                subfolders.append(entry)
+            elif is_image(entry.name) and entry.is_file():
+                stat = entry.stat()
+                images.append(ImageEntry(entry.name, entry.path, stat.st_size, stat.st_mtime_ns))
+    subfolders.sort(key=lambda entry: entry.name)
+    images.sort(key=lambda image: image.name)
+    return subfolders, tuple(images)
+
+
+def scan(root_folder, recursive=True):
+    # 每个子文件夹对应一个任务，文件夹和图片按名称排序
+    # recursive为True时包含所有层级的子文件夹，顺序与os.walk相同：先列出同一层的文件夹，再依次进入下一层
+    folders = []
+
+    def visit(subfolders):
+        scanned = [(entry, *scan_folder(entry.path)) for entry in subfolders]
+        for entry, _, images in scanned:
+            folders.append(FolderJob(entry.name, entry.path, os.path.relpath(entry.path, root_folder), images))
+        if recursive:
+            for entry, children, _ in scanned:
+                # 和os.walk一样不进入指向文件夹的链接
+                if not entry.is_symlink():
+                    visit(children)
+
+    visit(scan_folder(root_folder)[0])
+    return JobPlan(root_folder, tuple(folders))
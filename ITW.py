@@ -1,75 +1,51 @@
-import os
-from docx import Document
-from docx.shared import Cm
-from PIL import Image
+import multiprocessing
 from PyQt5.QtWidgets import QApplication, QWidget, QVBoxLayout, QHBoxLayout, QPushButton, QLineEdit, QLabel, \
-    QFileDialog, QProgressBar, QGraphicsOpacityEffect, QFrame
+    QFileDialog, QProgressBar, QGraphicsOpacityEffect, QFrame, QSpinBox
 from PyQt5.QtCore import QThread, pyqtSignal, Qt
 from PyQt5.QtGui import QPixmap, QIcon
 
+try:
+    from .ImageResize import default_jobs
+    from .ExportEngine import ExportControl, export_word
+except ImportError:
+    from ImageResize import default_jobs
+    from ExportEngine import ExportControl, export_word
+
 
 class Worker(QThread):
     progress_changed = pyqtSignal(int)
+    status_changed = pyqtSignal(str)
 
-    def __init__(self, root_folder, output_folder):
+    def __init__(self, root_folder, output_folder, jobs=None, fast_decode=True, use_cache=True, incremental=True,
+                 streaming=False):
         super().__init__()
         self.root_folder = root_folder
         self.output_folder = output_folder
+        self.jobs = jobs
+        self.fast_decode = fast_decode
+        self.use_cache = use_cache
+        self.incremental = incremental
+        self.streaming = streaming
+        self.control = ExportControl()
 
     def run(self):
-        # 获取所有图片文件数量
-        total_images = sum(
-            [len([f for f in os.listdir(os.path.join(self.root_folder, d)) if f.endswith(('.png', '.jpg', '.jpeg'))])
-             for d in os.listdir(self.root_folder) if os.path.isdir(os.path.join(self.root_folder, d))])
-
-        current_image = 0
-
-        # 遍历文件夹
-        for dirpath, dirnames, filenames in os.walk(self.root_folder):
-            for dirname in dirnames:
-                # 创建一个空文档
-                document = Document()
-                table = document.add_table(rows=50, cols=2)
-
-                subfolder_path = os.path.join(dirpath, dirname)
-                image_files = [f for f in os.listdir(subfolder_path) if f.endswith(('.png', '.jpg', '.jpeg'))]
-
-                row = 0
-                col = 0
-                for image_file in image_files:
-                    image_path = os.path.join(subfolder_path, image_file)
-
-                    # 修改图片尺寸
-                    image = Image.open(image_path)
-                    width, height = image.size
-                    new_width, new_height = 2000, 1500
-                    if width > new_width:
-                        height = int(new_width * height / width)
-                        width = new_width
-                    if height > new_height:
-                        width = int(new_height * width / height)
-                        height = new_height
-
-                    image.resize((new_width, new_height)).save(image_path)
-
-                    # 将图片插入表格
-                    cell = table.cell(row, col)
-                    paragraph = cell.add_paragraph()
-                    run = paragraph.add_run()
-                    run.add_picture(image_path, width=Cm(7.51), height=Cm(5.64))
-
-                    col += 1
-                    if col == 2:
-                        col = 0
-                        row += 1
-
-                    current_image += 1
-                    progress = int((current_image / total_images) * 100)
-                    self.progress_changed.emit(progress)
-
-                # 保存文档
-                docx_path = os.path.join(self.output_folder, f'{dirname}.docx')
-                document.save(docx_path)
+        # 图片按原比例缩小到不超过2000x1500，插入50行2列的表格，单元格图片大小7.51x5.64厘米
+        export_word(self.root_folder, self.output_folder, 50, 2, 2000, 1500, 7.51, 5.64, jobs=self.jobs,
+                    fast_decode=self.fast_decode, use_cache=self.use_cache, incremental=self.incremental,
+                    streaming=self.streaming, progress_callback=self.report_progress, control=self.control)
+
+    def pause(self):
+        self.control.pause()
+
+    def resume(self):
+        self.control.resume()
+
+    def cancel(self):
+        self.control.cancel()
+
+    def report_progress(self, progress):
+        self.progress_changed.emit(progress.percent())
+        self.status_changed.emit(progress.status_text())
 
 
 class App(QWidget):
@@ -114,15 +90,39 @@ class App(QWidget):
         self.output_layout.addWidget(self.output_line)
         self.output_layout.addWidget(self.output_button)
 
+        # 并行处理进程数部分
+        self.jobs_layout = QHBoxLayout()
+        self.jobs_label = QLabel('并行处理进程数:')
+        self.jobs_input = QSpinBox(self)
+        self.jobs_input.setRange(1, 64)
+        self.jobs_input.setValue(min(default_jobs(), 64))  # 默认使用全部CPU核心
+        self.jobs_layout.addWidget(self.jobs_label)
+        self.jobs_layout.addWidget(self.jobs_input)
+        self.jobs_layout.addStretch()
+
         # 进度条
         self.progress_bar = QProgressBar(self)
         self.progress_bar.setRange(0, 100)
         self.progress_bar.setValue(0)
 
+        # 处理速度和剩余时间
+        self.status_label = QLabel(self)
+
         # 开始按钮
         self.start_button = QPushButton('开始处理', self)
         self.start_button.clicked.connect(self.start_processing)
 
+        # 暂停/继续和取消按钮，只在处理过程中可用
+        self.control_layout = QHBoxLayout()
+        self.pause_button = QPushButton('暂停', self)
+        self.pause_button.setEnabled(False)
+        self.pause_button.clicked.connect(self.toggle_pause)
+        self.cancel_button = QPushButton('取消', self)
+        self.cancel_button.setEnabled(False)
+        self.cancel_button.clicked.connect(self.cancel_processing)
+        self.control_layout.addWidget(self.pause_button)
+        self.control_layout.addWidget(self.cancel_button)
+
         # 版权信息
         self.copyright_label = QLabel('Copyright: MiemieY', self)
         self.copyright_label.setAlignment(Qt.AlignRight | Qt.AlignBottom)  # 右下角显示
@@ -131,8 +131,11 @@ class App(QWidget):
         # 将UI元素添加到主布局
         layout.addLayout(self.folder_input_layout)
         layout.addLayout(self.output_layout)
+        layout.addLayout(self.jobs_layout)
         layout.addWidget(self.progress_bar)
+        layout.addWidget(self.status_label)
         layout.addWidget(self.start_button)
+        layout.addLayout(self.control_layout)
         layout.addWidget(self.copyright_label)  # 版权信息放在最下面
 
         self.setLayout(layout)
@@ -160,19 +163,51 @@ class App(QWidget):
     def start_processing(self):
         root_folder = self.folder_input_line.text()
         output_folder = self.output_line.text()
+        jobs = self.jobs_input.value()
 
         if not root_folder or not output_folder:
             return
 
-        self.worker = Worker(root_folder, output_folder)
+        self.worker = Worker(root_folder, output_folder, jobs)
         self.worker.progress_changed.connect(self.update_progress)
+        self.worker.status_changed.connect(self.status_label.setText)
+        self.worker.finished.connect(self.processing_finished)
         self.worker.start()
 
+        # 处理过程中禁止重复启动
+        self.start_button.setEnabled(False)
+        self.pause_button.setEnabled(True)
+        self.pause_button.setText('暂停')
+        self.cancel_button.setEnabled(True)
+
+    def toggle_pause(self):
+        if not self.worker.control.is_paused():
+            self.worker.pause()
+            self.pause_button.setText('继续')
+            self.status_label.setText('已暂停')
+        else:
+            self.worker.resume()
+            self.pause_button.setText('暂停')
+
+    def cancel_processing(self):
+        self.worker.cancel()
+        self.pause_button.setEnabled(False)
+        self.cancel_button.setEnabled(False)
+        self.status_label.setText('正在取消...')
+
+    def processing_finished(self):
+        if self.worker.control.cancelled:
+            self.status_label.setText('已取消，已完成的文档保留在输出文件夹中')
+        self.start_button.setEnabled(True)
+        self.pause_button.setEnabled(False)
+        self.cancel_button.setEnabled(False)
+
     def update_progress(self, progress):
         self.progress_bar.setValue(progress)
 
 
 if __name__ == '__main__':
+    multiprocessing.freeze_support()
     app = QApplication([])
     window = App()
     window.show()
@@ -0,0 +1,57 @@
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+# 图片文件夹在网络共享上时，读取文件的等待时间和解码、插入文档的时间重叠进行
+# 默认提前读取8张，已读取但还没有处理的数据不超过256MB
+DEFAULT_PREFETCH_DEPTH = 8
+DEFAULT_PREFETCH_BYTES = 256 * 1024 ** 2
+# 读取文件只等待网络，线程不需要太多
+PREFETCH_THREADS = 4
+
+
+def read_file(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+class PrefetchBudget:
+    # 同一个prefetcher创建的各预读流共享的数据量上限，in_flight为所有流读取中和已读取未取走的总量
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.in_flight = 0
+
+
+def read_ahead(paths, sizes, depth=DEFAULT_PREFETCH_DEPTH, budget=None):
+    # 在线程池中提前读取后面depth张图片的内容，按paths的顺序返回(图片路径, 文件内容)，出错时可以给出是哪张图片
+    # sizes为图片路径对应的文件大小，共享budget的所有预读流中读取中和已读取未取走的总量不超过budget.max_bytes
+    # 超出的单个文件单独读取，本流没有未取走的文件时不等待其他流，各流之间不会互相等待
+    budget = budget or PrefetchBudget(DEFAULT_PREFETCH_BYTES)
+    executor = ThreadPoolExecutor(max_workers=min(depth, PREFETCH_THREADS))
+    pending = deque()
+    try:
+        for path in paths:
+            size = sizes.get(path, 0)
+            while pending and (len(pending) >= depth or budget.in_flight + size > budget.max_bytes):
+                done_path, future, done_size = pending.popleft()
+                budget.in_flight -= done_size
+                yield done_path, future.result()
+            pending.append((path, executor.submit(read_file, path), size))
+            budget.in_flight += size
+        while pending:
+            path, future, size = pending.popleft()
+            budget.in_flight -= size
+            yield path, future.result()
+    finally:
+        # 提前结束时不再读取还没开始的文件，未取走的数据量还给其他流
+        budget.in_flight -= sum(size for _, _, size in pending)
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
+def prefetcher(images, depth=DEFAULT_PREFETCH_DEPTH, max_bytes=DEFAULT_PREFETCH_BYTES):
+    # 返回预读images中任意一组图片的函数，参数为图片路径列表；depth为0时不预读，返回None
+    # 返回的函数可以多次调用，例如直接插入的图片和需要压缩的图片各一个预读流，所有流共享max_bytes
+    if not depth:
+        return None
+    sizes = {image.path: image.size for image in images}
+    return partial(read_ahead, sizes=sizes, depth=depth, budget=PrefetchBudget(max_bytes))
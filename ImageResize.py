@@ -0,0 +1,286 @@
+import io
+import os
+import time
+import warnings
+from collections import deque
+from functools import partial
+from itertools import repeat
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from PIL import Image, UnidentifiedImageError
+
+# 尺寸不变时可以直接使用原文件的格式，保存格式与原图相同
+PASSTHROUGH_FORMATS = ('JPEG', 'PNG')
+
+# 超过这个像素数的图片视为解压炸弹直接报错，None表示不限制
+DEFAULT_PIXEL_LIMIT = 1000 * 1000 * 1000
+# 同时解码的像素总数上限，按8GB内存、每像素4字节留出余量
+DEFAULT_PIXEL_BUDGET = 300 * 1000 * 1000
+# 超过这个像素数的图片即使没有开启快速解码也按缩小后的分辨率解码
+LARGE_IMAGE_PIXELS = 50 * 1000 * 1000
+
+_pixel_limit = DEFAULT_PIXEL_LIMIT
+# 各阶段耗时，只在timed_call调用期间记录，平时为None
+_timings = None
+
+
+def set_pixel_limit(limit):
+    # Pillow在像素数超过MAX_IMAGE_PIXELS两倍时报错，之间只给出警告，这里统一为超过limit即报错
+    global _pixel_limit
+    _pixel_limit = limit
+    Image.MAX_IMAGE_PIXELS = limit // 2 if limit else None
+    warnings.simplefilter('ignore', Image.DecompressionBombWarning)
+
+
+set_pixel_limit(DEFAULT_PIXEL_LIMIT)
+
+
+def default_jobs():
+    # 默认并行进程数为CPU核心数
+    return os.cpu_count() or 1
+
+
+def fit_size(width, height, new_width, new_height):
+    # 按原图比例计算不超过目标宽高的尺寸
+    if width > new_width:
+        height = int(new_width * height / width)
+        width = new_width
+    if height > new_height:
+        width = int(new_height * width / height)
+        height = new_height
+    return width, height
+
+
+def decode_pixels(header, size, reduced):
+    # 按文件头估算解码时占用的像素数，JPEG缩小解码时按1/2、1/4、1/8计算
+    if header is None:
+        return size[0] * size[1]
+    width, height, image_format = header
+    scale = 1
+    if reduced or width * height > LARGE_IMAGE_PIXELS:
+        if image_format in ('JPEG', 'MPO'):
+            while scale < 8 and width // (scale * 2) >= size[0] and height // (scale * 2) >= size[1]:
+                scale *= 2
+    return (width // scale) * (height // scale) + size[0] * size[1]
+
+
+def read_header(image_path):
+    # Image.open只读取文件头，得到尺寸和格式，不解码像素；无法识别的图片返回None，留给压缩时报错
+    try:
+        with Image.open(image_path) as image:
+            return image.width, image.height, image.format
+    except (OSError, SyntaxError, ValueError):
+        return None
+
+
+def read_headers(image_paths, jobs):
+    # 读取文件头主要是等待磁盘或网络，用线程并行
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as executor:
+        return list(executor.map(read_header, image_paths))
+
+
+def target_sizes(headers, new_width, new_height, keep_ratio=True):
+    # 一次计算所有图片的目标尺寸
+    if not keep_ratio:
+        return [(new_width, new_height)] * len(headers)
+    return [fit_size(header[0], header[1], new_width, new_height) if header else (new_width, new_height)
+            for header in headers]
+
+
+def needs_resize(headers, new_width, new_height, keep_ratio=True):
+    # 目标尺寸与原图相同、且原图格式可以直接使用时不需要解码和重新编码，原文件原样插入
+    return [header is None or size != header[:2] or header[2] not in PASSTHROUGH_FORMATS
+            for header, size in zip(headers, target_sizes(headers, new_width, new_height, keep_ratio))]
+
+
+def cm_to_pixels(cm, dpi):
+    # 按打印分辨率把厘米换算成像素
+    return max(1, round(cm / 2.54 * dpi))
+
+
+def use_draft(image, fast_decode):
+    return fast_decode or image.width * image.height > LARGE_IMAGE_PIXELS
+
+
+def record(stage, start):
+    # 累计从start到现在的耗时，没有开启记录时只多一次判断
+    if _timings is not None:
+        _timings[stage] = _timings.get(stage, 0.0) + time.perf_counter() - start
+
+
+def timed_call(func, item):
+    # 调用func，同时返回其中打开、解码、缩放、编码各阶段的耗时
+    global _timings
+    _timings = {}
+    try:
+        return func(item), _timings
+    finally:
+        _timings = None
+
+
+def open_image(source):
+    # source为图片路径，或预读的(图片路径, 文件内容)；预读的图片无法识别时，报错信息中同样给出图片路径
+    if isinstance(source, tuple):
+        image_path, data = source
+        try:
+            return Image.open(io.BytesIO(data))
+        except UnidentifiedImageError:
+            raise UnidentifiedImageError(f'cannot identify image file {image_path!r}') from None
+    return Image.open(source)
+
+
+def draft_for_size(image, size):
+    # JPEG利用DCT缩放直接按1/2、1/4、1/8解码，解码结果仍不小于目标尺寸
+    if image.format in ('JPEG', 'MPO'):
+        image.draft(image.mode, size)
+
+
+def resize_to(image, size, fast_decode=False):
+    # 快速解码模式下先快速缩小到目标附近，再做一次高质量重采样
+    if fast_decode:
+        return image.resize(size, Image.LANCZOS, reducing_gap=2.0)
+    return image.resize(size)
+
+
+def load_resized(image_path, new_width, new_height, keep_ratio=True, fast_decode=False):
+    # 读取图片并修改尺寸，同时返回原图格式
+    start = time.perf_counter()
+    with open_image(image_path) as image:
+        if keep_ratio:
+            size = fit_size(image.width, image.height, new_width, new_height)
+        else:
+            size = (new_width, new_height)
+        # 相机拍摄的MPO格式按普通JPEG保存
+        image_format = 'JPEG' if image.format == 'MPO' else image.format
+        if use_draft(image, fast_decode):
+            draft_for_size(image, size)
+        record('open', start)
+
+        start = time.perf_counter()
+        image.load()
+        record('decode', start)
+
+        start = time.perf_counter()
+        resized = resize_to(image, size, fast_decode)
+        record('resize', start)
+        return resized, image_format
+
+
+def resize_image(image_path, new_width, new_height, keep_ratio=True, fast_decode=False):
+    # 修改图片尺寸并覆盖保存
+    resized, image_format = load_resized(image_path, new_width, new_height, keep_ratio, fast_decode)
+    start = time.perf_counter()
+    resized.save(image_path, format=image_format)
+    record('encode', start)
+    return image_path
+
+
+def resize_image_to_bytes(image_path, new_width, new_height, keep_ratio=True, fast_decode=False):
+    # 修改图片尺寸后只编码到内存中，不改动原图片文件；image_path也可以是预读的(图片路径, 文件内容)
+    resized, image_format = load_resized(image_path, new_width, new_height, keep_ratio, fast_decode)
+    start = time.perf_counter()
+    buffer = io.BytesIO()
+    resized.save(buffer, format=image_format)
+    record('encode', start)
+    return buffer.getvalue()
+
+
+def resize_image_for_print(image_path, width_px, height_px, quality=85, fast_decode=False):
+    # 按单元格打印尺寸一次性重采样，并重新编码为JPEG，不放大比目标小的图片；image_path也可以是预读的(图片路径, 文件内容)
+    start = time.perf_counter()
+    with open_image(image_path) as image:
+        size = (min(width_px, image.width), min(height_px, image.height))
+        if use_draft(image, fast_decode):
+            draft_for_size(image, size)
+        record('open', start)
+
+        start = time.perf_counter()
+        image.load()
+        record('decode', start)
+
+        start = time.perf_counter()
+        if image.mode not in ('RGB', 'L'):
+            image = image.convert('RGB')
+        resized = image.resize(size, Image.LANCZOS, reducing_gap=2.0 if fast_decode else None)
+        record('resize', start)
+    start = time.perf_counter()
+    buffer = io.BytesIO()
+    resized.save(buffer, format='JPEG', quality=quality, optimize=True)
+    record('encode', start)
+    return buffer.getvalue()
+
+
+class SharedPixelBudget:
+    # 多个进程共享的解码像素预算，通过multiprocessing.Manager在进程间同步
+    # 解码前申请，总量超出预算时等待其他进程释放；超出预算的单张图片等到没有其他图片在解码时单独处理
+    def __init__(self, manager, budget):
+        self.budget = budget
+        self.condition = manager.Condition()
+        self.in_use = manager.Value('d', 0)
+
+    def acquire(self, cost):
+        with self.condition:
+            while self.in_use.value and self.in_use.value + cost > self.budget:
+                self.condition.wait()
+            self.in_use.value += cost
+
+    def release(self, cost):
+        with self.condition:
+            self.in_use.value -= cost
+            self.condition.notify_all()
+
+
+def parallel_map(func, items, jobs, costs=None, budget=None, on_timings=None):
+    # 用进程池并行处理，结果按输入顺序依次返回
+    # costs为每个任务解码时占用的像素数，同时处理的任务总和不超过budget；超出预算的单个任务单独处理
+    # budget为SharedPixelBudget时与其他进程共享预算，只能逐个处理（jobs为1）
+    # 设置on_timings时，每个结果返回前先把该任务各阶段的耗时交给on_timings
+    if on_timings:
+        results = parallel_map(partial(timed_call, func), items, jobs, costs, budget)
+        try:
+            for result, timings in results:
+                on_timings(timings)
+                yield result
+        finally:
+            results.close()
+        return
+
+    if jobs <= 1:
+        if isinstance(budget, SharedPixelBudget) and costs:
+            for item, cost in zip(items, costs):
+                budget.acquire(cost)
+                try:
+                    result = func(item)
+                finally:
+                    budget.release(cost)
+                yield result
+            return
+        for item in items:
+            yield func(item)
+        return
+
+    costs = costs or repeat(0)
+    budget = budget or float('inf')
+    # 子进程使用与主进程相同的解压炸弹限制
+    executor = ProcessPoolExecutor(max_workers=jobs, initializer=set_pixel_limit, initargs=(_pixel_limit,))
+    try:
+        pending = deque()
+        in_flight = 0
+        for item, cost in zip(items, costs):
+            # 内存预算不足时先等待最早的任务完成
+            while pending and in_flight + cost > budget:
+                future, done_cost = pending.popleft()
+                in_flight -= done_cost
+                yield future.result()
+            pending.append((executor.submit(func, item), cost))
+            in_flight += cost
+            # 限制已提交但未取出的任务数量，避免结果堆积占用内存
+            if len(pending) >= jobs * 2:
+                future, done_cost = pending.popleft()
+                in_flight -= done_cost
+                yield future.result()
+        while pending:
+            yield pending.popleft()[0].result()
+    finally:
+        # 提前结束（例如取消任务）时丢弃还没开始的任务，并等待进程退出
+        executor.shutdown(wait=True, cancel_futures=True)
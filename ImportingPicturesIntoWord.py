@@ -1,17 +1,33 @@
-import os
-from docx import Document
-from docx.shared import Cm
-from PIL import Image
+import multiprocessing
 from PyQt5.QtWidgets import QApplication, QWidget, QVBoxLayout, QHBoxLayout, QPushButton, QLineEdit, QLabel, \
-    QFileDialog, QProgressBar, QSpinBox, QFormLayout, QDoubleSpinBox
+    QFileDialog, QProgressBar, QSpinBox, QFormLayout, QDoubleSpinBox, QCheckBox, QComboBox, QMessageBox
 from PyQt5.QtCore import QThread, pyqtSignal, Qt
 from PyQt5.QtGui import QPixmap, QIcon, QPalette, QBrush, QPainter
 
+try:
+    from .ImageResize import default_jobs
+    from .ResizeCache import clear_cache
+    from .BackgroundCache import BackgroundRenderer
+    from .ExportEngine import ExportControl, export_word
+    from .ImagePrefetch import DEFAULT_PREFETCH_DEPTH
+    from .ThumbnailPreview import ThumbnailPreview
+except ImportError:
+    from ImageResize import default_jobs
+    from ResizeCache import clear_cache
+    from BackgroundCache import BackgroundRenderer
+    from ExportEngine import ExportControl, export_word
+    from ImagePrefetch import DEFAULT_PREFETCH_DEPTH
+    from ThumbnailPreview import ThumbnailPreview
+
 
 class Worker(QThread):
     progress_changed = pyqtSignal(int)
+    status_changed = pyqtSignal(str)
 
-    def __init__(self, root_folder, output_folder, rows, cols, new_width, new_height, image_width, image_height):
+    def __init__(self, root_folder, output_folder, rows, cols, new_width, new_height, image_width, image_height,
+                 jobs=None, keep_originals=True, dpi=None, quality=85, fast_decode=True, use_cache=True,
+                 incremental=True, streaming=False, max_part_images=None, max_part_mb=None, per_folder=False,
+                 report=False, prefetch=DEFAULT_PREFETCH_DEPTH):
         super().__init__()
         self.root_folder = root_folder
         self.output_folder = output_folder
@@ -21,61 +37,42 @@ class Worker(QThread):
         self.new_height = new_height
         self.image_width = image_width
         self.image_height = image_height
+        self.jobs = jobs
+        self.keep_originals = keep_originals
+        self.dpi = dpi
+        self.quality = quality
+        self.fast_decode = fast_decode
+        self.use_cache = use_cache
+        self.incremental = incremental
+        self.streaming = streaming
+        self.max_part_images = max_part_images
+        self.max_part_mb = max_part_mb
+        self.per_folder = per_folder
+        self.report = report
+        self.prefetch = prefetch
+        self.control = ExportControl()
 
     def run(self):
-        # 获取所有图片文件数量
-        total_images = sum(
-            [len([f for f in os.listdir(os.path.join(self.root_folder, d)) if f.endswith(('.png', '.jpg', '.jpeg'))])
-             for d in os.listdir(self.root_folder) if os.path.isdir(os.path.join(self.root_folder, d))])
-
-        current_image = 0
-
-        # 遍历文件夹
-        for dirpath, dirnames, filenames in os.walk(self.root_folder):
-            for dirname in dirnames:
-                # 创建一个空文档
-                document = Document()
-                # 创建一个空表格，表格为自定义的行和列
-                table = document.add_table(rows=self.rows, cols=self.cols)
-
-                subfolder_path = os.path.join(dirpath, dirname)
-                image_files = [f for f in os.listdir(subfolder_path) if f.endswith(('.png', '.jpg', '.jpeg'))]
-
-                row = 0
-                col = 0
-                for image_file in image_files:
-                    image_path = os.path.join(subfolder_path, image_file)
-
-                    # 修改图片尺寸
-                    image = Image.open(image_path)
-                    width, height = image.size
-                    if width > self.new_width:
-                        height = int(self.new_width * height / width)
-                        width = self.new_width
-                    if height > self.new_height:
-                        width = int(self.new_height * width / height)
-                        height = self.new_height
-
-                    image.resize((width, height)).save(image_path)
-
-                    # 将图片插入表格
-                    cell = table.cell(row, col)
-                    paragraph = cell.add_paragraph()
-                    run = paragraph.add_run()
-                    run.add_picture(image_path, width=Cm(self.image_width), height=Cm(self.image_height))
-
-                    col += 1
-                    if col == self.cols:
-                        col = 0
-                        row += 1
-
-                    current_image += 1
-                    progress = int((current_image / total_images) * 100)
-                    self.progress_changed.emit(progress)
-
-                # 保存文档
-                docx_path = os.path.join(self.output_folder, f'{dirname}.docx')
-                document.save(docx_path)
+        # 实际的导出工作由ExportEngine完成，这里只负责把进度转发到界面
+        export_word(self.root_folder, self.output_folder, self.rows, self.cols, self.new_width, self.new_height,
+                    self.image_width, self.image_height, jobs=self.jobs, keep_originals=self.keep_originals,
+                    dpi=self.dpi, quality=self.quality, fast_decode=self.fast_decode, use_cache=self.use_cache,
+                    incremental=self.incremental, streaming=self.streaming, progress_callback=self.report_progress,
+                    control=self.control, max_part_images=self.max_part_images, max_part_mb=self.max_part_mb,
+                    per_folder=self.per_folder, report=self.report, prefetch=self.prefetch)
+
+    def pause(self):
+        self.control.pause()
+
+    def resume(self):
+        self.control.resume()
+
+    def cancel(self):
+        self.control.cancel()
+
+    def report_progress(self, progress):
+        self.progress_changed.emit(progress.percent())
+        self.status_changed.emit(progress.status_text())
 
 
 class App(QWidget):
@@ -83,11 +80,12 @@ class App(QWidget):
         super().__init__()
 
         self.setWindowTitle('图片插入Word表格工具')
-        self.resize(550, 400)
+        self.resize(1100, 600)
         self.setWindowIcon(QIcon('./icon/00002.png'))  # 设置图标
 
         # 加载背景图片
         self.background_pixmap = QPixmap("./Pictures/00031-1149160498.png")
+        self.background = BackgroundRenderer(self, self.background_pixmap)
 
         '''
         # 设置自动填充背景
@@ -118,6 +116,7 @@ class App(QWidget):
         self.folder_input_layout = QHBoxLayout()
         self.folder_input_label = QLabel('选择图片文件夹:')
         self.folder_input_line = QLineEdit(self)
+        self.folder_input_line.editingFinished.connect(self.update_preview)
         self.folder_input_button = QPushButton('浏览', self)
         self.folder_input_button.clicked.connect(self.select_folder)
         self.folder_input_layout.addWidget(self.folder_input_label)
@@ -154,6 +153,81 @@ class App(QWidget):
         self.size_layout.addRow('图片目标宽度:', self.new_width_input)
         self.size_layout.addRow('图片目标高度:', self.new_height_input)
 
+        # 打印分辨率，选择后按单元格尺寸计算图片像素，忽略上面的目标宽高
+        self.dpi_input = QComboBox(self)
+        self.dpi_input.addItem('不限制（使用目标宽高）', 0)
+        for dpi in (150, 220, 300):
+            self.dpi_input.addItem(f'{dpi} DPI', dpi)
+        self.dpi_input.currentIndexChanged.connect(self.update_dpi_mode)
+        self.quality_input = QSpinBox(self)
+        self.quality_input.setRange(1, 95)
+        self.quality_input.setValue(85)  # 默认JPEG质量
+        self.quality_input.setEnabled(False)
+        self.size_layout.addRow('打印分辨率:', self.dpi_input)
+        self.size_layout.addRow('JPEG质量:', self.quality_input)
+
+        # 并行处理进程数输入
+        self.jobs_input = QSpinBox(self)
+        self.jobs_input.setRange(1, 64)
+        self.jobs_input.setValue(min(default_jobs(), 64))  # 默认使用全部CPU核心
+        self.size_layout.addRow('并行处理进程数:', self.jobs_input)
+
+        # 是否保留原图
+        self.keep_originals_checkbox = QCheckBox('保留原图（压缩结果只写入文档，不覆盖原图片文件）', self)
+        self.keep_originals_checkbox.setChecked(True)
+        self.size_layout.addRow(self.keep_originals_checkbox)
+
+        # 是否快速解码大尺寸JPEG
+        self.fast_decode_checkbox = QCheckBox('快速解码大尺寸JPEG（按接近目标的尺寸解码后再精细缩放）', self)
+        self.fast_decode_checkbox.setChecked(True)
+        self.size_layout.addRow(self.fast_decode_checkbox)
+
+        # 是否使用压缩结果缓存
+        self.cache_layout = QHBoxLayout()
+        self.use_cache_checkbox = QCheckBox('使用压缩结果缓存（重复处理相同图片时直接读取）', self)
+        self.use_cache_checkbox.setChecked(True)
+        self.clear_cache_button = QPushButton('清空缓存', self)
+        self.clear_cache_button.clicked.connect(self.clear_resize_cache)
+        self.cache_layout.addWidget(self.use_cache_checkbox)
+        self.cache_layout.addStretch()
+        self.cache_layout.addWidget(self.clear_cache_button)
+        self.size_layout.addRow(self.cache_layout)
+
+        # 是否只重新生成有变化的子文件夹
+        self.incremental_checkbox = QCheckBox('增量生成（只重新生成图片或设置有变化的文件夹）', self)
+        self.incremental_checkbox.setChecked(True)
+        self.size_layout.addRow(self.incremental_checkbox)
+
+        # 文档生成方式
+        self.writer_input = QComboBox(self)
+        self.writer_input.addItem('标准（python-docx）', False)
+        self.writer_input.addItem('低内存流式写入（适合图片很多的文件夹）', True)
+        self.size_layout.addRow('文档生成方式:', self.writer_input)
+
+        # 图片很多时把一个文件夹拆分为多个文档，0表示不拆分
+        self.part_images_input = QSpinBox(self)
+        self.part_images_input.setRange(0, 100000)
+        self.part_images_input.setValue(0)
+        self.part_mb_input = QSpinBox(self)
+        self.part_mb_input.setRange(0, 10000)
+        self.part_mb_input.setValue(0)
+        self.size_layout.addRow('每个文档最多图片数（0为不拆分）:', self.part_images_input)
+        self.size_layout.addRow('每个文档最大MB（0为不拆分）:', self.part_mb_input)
+
+        # 是否按文件夹并行
+        self.per_folder_checkbox = QCheckBox('按文件夹并行（每个进程生成一个文档，适合子文件夹很多的任务）', self)
+        self.size_layout.addRow(self.per_folder_checkbox)
+
+        # 提前读取的图片数，图片在网络共享上时加大可以减少等待读取的时间
+        self.prefetch_input = QSpinBox(self)
+        self.prefetch_input.setRange(0, 256)
+        self.prefetch_input.setValue(DEFAULT_PREFETCH_DEPTH)
+        self.size_layout.addRow('提前读取图片数（0为不预读）:', self.prefetch_input)
+
+        # 是否在输出文件夹中写入各阶段耗时报告
+        self.report_checkbox = QCheckBox('生成耗时报告（export_report.json/.csv）', self)
+        self.size_layout.addRow(self.report_checkbox)
+
         # 单元格图片大小输入
         self.cell_size_layout = QFormLayout()
         self.cell_width_input = QDoubleSpinBox(self)
@@ -168,10 +242,24 @@ class App(QWidget):
         self.progress_bar.setRange(0, 100)
         self.progress_bar.setValue(0)
 
+        # 处理速度和剩余时间
+        self.status_label = QLabel(self)
+
         # 开始按钮
         self.start_button = QPushButton('开始处理', self)
         self.start_button.clicked.connect(self.start_processing)
 
+        # 暂停/继续和取消按钮，只在处理过程中可用
+        self.control_layout = QHBoxLayout()
+        self.pause_button = QPushButton('暂停', self)
+        self.pause_button.setEnabled(False)
+        self.pause_button.clicked.connect(self.toggle_pause)
+        self.cancel_button = QPushButton('取消', self)
+        self.cancel_button.setEnabled(False)
+        self.cancel_button.clicked.connect(self.cancel_processing)
+        self.control_layout.addWidget(self.pause_button)
+        self.control_layout.addWidget(self.cancel_button)
+
         # 设置鼠标悬浮提示
         self.start_button.setToolTip("注意该程序只会同比例压缩图片文件，填入的图片像素比例若与原图片比例不同，程序会按照原图片比例来压缩")
 
@@ -188,10 +276,21 @@ class App(QWidget):
         layout.addLayout(self.size_layout)
         layout.addLayout(self.cell_size_layout)
         layout.addWidget(self.progress_bar)
+        layout.addWidget(self.status_label)
         layout.addWidget(self.start_button)
+        layout.addLayout(self.control_layout)
         layout.addLayout(footer_layout)
 
-        self.setLayout(layout)
+        # 右侧的导出预览，每页对应一个将要生成的文档
+        self.preview = ThumbnailPreview(self)
+        self.cols_input.valueChanged.connect(self.update_preview_layout)
+        self.part_images_input.valueChanged.connect(self.update_preview_layout)
+        self.update_preview_layout()
+
+        main_layout = QHBoxLayout()
+        main_layout.addLayout(layout)
+        main_layout.addWidget(self.preview, 1)
+        self.setLayout(main_layout)
 
         # 居中显示UI
         self.center()
@@ -203,10 +302,28 @@ class App(QWidget):
         frame_geometry.moveCenter(center_point)
         self.move(frame_geometry.topLeft())
 
+    def update_dpi_mode(self):
+        # 使用打印分辨率时目标宽高不再生效
+        use_dpi = bool(self.dpi_input.currentData())
+        self.new_width_input.setEnabled(not use_dpi)
+        self.new_height_input.setEnabled(not use_dpi)
+        self.quality_input.setEnabled(use_dpi)
+
+    def clear_resize_cache(self):
+        clear_cache()
+        QMessageBox.information(self, '提示', '缓存已清空')
+
     def select_folder(self):
         folder = QFileDialog.getExistingDirectory(self, '选择图片文件夹')
         if folder:
             self.folder_input_line.setText(folder)
+            self.update_preview()
+
+    def update_preview(self):
+        self.preview.set_root(self.folder_input_line.text())
+
+    def update_preview_layout(self):
+        self.preview.set_layout(self.cols_input.value(), self.part_images_input.value() or None)
 
     def select_output_folder(self):
         folder = QFileDialog.getExistingDirectory(self, '选择输出文件夹')
@@ -222,31 +339,76 @@ class App(QWidget):
         new_height = self.new_height_input.value()
         image_width = self.cell_width_input.value()
         image_height = self.cell_height_input.value()
+        jobs = self.jobs_input.value()
+        keep_originals = self.keep_originals_checkbox.isChecked()
+        dpi = self.dpi_input.currentData()
+        quality = self.quality_input.value()
+        fast_decode = self.fast_decode_checkbox.isChecked()
+        use_cache = self.use_cache_checkbox.isChecked()
+        incremental = self.incremental_checkbox.isChecked()
+        streaming = self.writer_input.currentData()
+        max_part_images = self.part_images_input.value() or None
+        max_part_mb = self.part_mb_input.value() or None
+        per_folder = self.per_folder_checkbox.isChecked()
+        report = self.report_checkbox.isChecked()
+        prefetch = self.prefetch_input.value()
 
         if not root_folder or not output_folder:
             return
 
-        self.worker = Worker(root_folder, output_folder, rows, cols, new_width, new_height, image_width, image_height)
+        self.worker = Worker(root_folder, output_folder, rows, cols, new_width, new_height, image_width, image_height,
+                             jobs, keep_originals, dpi, quality, fast_decode, use_cache, incremental,
+                             streaming, max_part_images, max_part_mb, per_folder, report, prefetch)
         self.worker.progress_changed.connect(self.update_progress)
+        self.worker.status_changed.connect(self.status_label.setText)
+        self.worker.finished.connect(self.processing_finished)
         self.worker.start()
 
+        # 处理过程中禁止重复启动
+        self.start_button.setEnabled(False)
+        self.pause_button.setEnabled(True)
+        self.pause_button.setText('暂停')
+        self.cancel_button.setEnabled(True)
+
+    def toggle_pause(self):
+        if not self.worker.control.is_paused():
+            self.worker.pause()
+            self.pause_button.setText('继续')
+            self.status_label.setText('已暂停')
+        else:
+            self.worker.resume()
+            self.pause_button.setText('暂停')
+
+    def cancel_processing(self):
+        self.worker.cancel()
+        self.pause_button.setEnabled(False)
+        self.cancel_button.setEnabled(False)
+        self.status_label.setText('正在取消...')
+
+    def processing_finished(self):
+        if self.worker.control.cancelled:
+            self.status_label.setText('已取消，已完成的文档保留在输出文件夹中')
+        self.start_button.setEnabled(True)
+        self.pause_button.setEnabled(False)
+        self.cancel_button.setEnabled(False)
+
     def update_progress(self, progress):
         self.progress_bar.setValue(progress)
 
 
+    def resizeEvent(self, event):
+        self.background.resized()
+        super().resizeEvent(event)
+
     def paintEvent(self, event):
         painter = QPainter(self)
-        window_size = self.size()
-
-        # 将背景图像调整为窗口大小
-        scaled_pixmap = self.background_pixmap.scaled(window_size, Qt.KeepAspectRatioByExpanding,
-                                                      Qt.SmoothTransformation)
 
-        # 绘制背景图像
-        painter.drawPixmap(0, 0, scaled_pixmap)
+        # 绘制按窗口大小缓存的背景图像，只在窗口大小变化时重新缩放
+        self.background.paint(painter)
         painter.end()
 
 if __name__ == '__main__':
+    multiprocessing.freeze_support()
     app = QApplication([])
     window = App()
     window.show()
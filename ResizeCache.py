@@ -0,0 +1,186 @@
+import argparse
+import hashlib
+import os
+import sqlite3
+import time
+
+try:
+    from .ImageResize import parallel_map, timed_call
+except ImportError:
+    from ImageResize import parallel_map, timed_call
+
+# 缓存默认放在用户目录下，默认上限2GB
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.image_conversion_tools', 'resize_cache')
+DEFAULT_MAX_BYTES = 2 * 1024 ** 3
+# 超出上限时淘汰到上限的90%，每次从索引中读取最旧的一批记录
+EVICT_LOW_WATER = 0.9
+EVICT_BATCH = 256
+# 压缩算法有变化时修改版本号，使旧缓存全部失效
+CACHE_VERSION = 1
+
+
+class ResizeCache:
+    def __init__(self, cache_dir=None, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir or DEFAULT_CACHE_DIR
+        self.blob_dir = os.path.join(self.cache_dir, 'blobs')
+        self.max_bytes = max_bytes
+        os.makedirs(self.blob_dir, exist_ok=True)
+
+        # SQLite只保存索引，压缩后的图片数据单独存成文件
+        self.conn = sqlite3.connect(os.path.join(self.cache_dir, 'index.sqlite3'), timeout=30)
+        # WAL模式下读写互不阻塞，按文件夹并行时多个进程同时使用缓存
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.execute('CREATE TABLE IF NOT EXISTS entries '
+                          '(key TEXT PRIMARY KEY, size INTEGER NOT NULL, last_used REAL NOT NULL)')
+        self.conn.execute('CREATE INDEX IF NOT EXISTS entries_last_used ON entries (last_used)')
+        self.conn.commit()
+        self.total_bytes = self.conn.execute('SELECT COALESCE(SUM(size), 0) FROM entries').fetchone()[0]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        self.conn.commit()
+        self.conn.close()
+
+    @staticmethod
+    def make_key(image_path, params, stat=None):
+        # 缓存键由原图路径、文件大小、修改时间和压缩参数共同决定
+        # stat为扫描时已经得到的(大小, 修改时间)，没有时重新读取
+        if stat is None:
+            stat = os.stat(image_path)
+            stat = (stat.st_size, stat.st_mtime_ns)
+        source = repr((CACHE_VERSION, os.path.abspath(image_path), stat[0], stat[1], params))
+        return hashlib.sha1(source.encode('utf-8')).hexdigest()
+
+    def blob_path(self, key):
+        return os.path.join(self.blob_dir, key[:2], key)
+
+    def contains(self, key):
+        return self.conn.execute('SELECT 1 FROM entries WHERE key = ?', (key,)).fetchone() is not None
+
+    def get(self, key):
+        if not self.contains(key):
+            return None
+        try:
+            with open(self.blob_path(key), 'rb') as f:
+                data = f.read()
+        except OSError:
+            # 数据文件丢失时删除对应索引
+            self.remove(key)
+            return None
+        self.conn.execute('UPDATE entries SET last_used = ? WHERE key = ?', (time.time(), key))
+        # 及时提交，不让写锁一直占着，其他进程才能写入缓存
+        self.conn.commit()
+        return data
+
+    def put(self, key, data):
+        path = self.blob_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # 先写临时文件再替换，避免中途退出留下不完整的数据
+        temp_path = f'{path}.{os.getpid()}.tmp'
+        with open(temp_path, 'wb') as f:
+            f.write(data)
+        os.replace(temp_path, path)
+
+        old = self.conn.execute('SELECT size FROM entries WHERE key = ?', (key,)).fetchone()
+        if old:
+            self.total_bytes -= old[0]
+        self.conn.execute('INSERT OR REPLACE INTO entries (key, size, last_used) VALUES (?, ?, ?)',
+                          (key, len(data), time.time()))
+        self.total_bytes += len(data)
+        if self.total_bytes > self.max_bytes:
+            self.evict()
+        self.conn.commit()
+
+    def remove(self, key):
+        row = self.conn.execute('SELECT size FROM entries WHERE key = ?', (key,)).fetchone()
+        if row:
+            self.conn.execute('DELETE FROM entries WHERE key = ?', (key,))
+            self.total_bytes -= row[0]
+        try:
+            os.remove(self.blob_path(key))
+        except OSError:
+            pass
+
+    def evict(self):
+        # 超出容量上限时按最近最少使用的顺序删除到低水位，之后的多次写入不需要再淘汰
+        # 每次只读取最旧的一批记录，不扫描整个索引
+        low_water = self.max_bytes * EVICT_LOW_WATER
+        while self.total_bytes > low_water:
+            rows = self.conn.execute('SELECT key FROM entries ORDER BY last_used LIMIT ?',
+                                     (EVICT_BATCH,)).fetchall()
+            if not rows:
+                break
+            for (key,) in rows:
+                if self.total_bytes <= low_water:
+                    break
+                self.remove(key)
+        self.conn.commit()
+
+    def clear(self):
+        for (key,) in self.conn.execute('SELECT key FROM entries').fetchall():
+            self.remove(key)
+        self.conn.commit()
+        self.total_bytes = 0
+
+
+def clear_cache(cache_dir=None):
+    with ResizeCache(cache_dir) as cache:
+        cache.clear()
+
+
+def cached_map(func, image_paths, jobs, cache_dir=None, stats=None, costs=None, budget=None, on_timings=None,
+               prefetch=None):
+    # func需为functools.partial，压缩函数名和参数作为缓存键的一部分
+    # 命中缓存的图片直接读取，未命中的交给进程池压缩后写入缓存，结果按原顺序返回
+    # on_timings与parallel_map相同，命中缓存的图片只记录cache_hit
+    # prefetch为预读函数时，未命中的图片先在后台读取文件内容，再交给进程池压缩
+    params = (func.func.__name__, sorted(func.keywords.items()))
+    stats = stats or [None] * len(image_paths)
+    with ResizeCache(cache_dir) as cache:
+        keys = [cache.make_key(image_path, params, stat) for image_path, stat in zip(image_paths, stats)]
+        hits = [cache.contains(key) for key in keys]
+        misses = [image_path for image_path, hit in zip(image_paths, hits) if not hit]
+        if costs:
+            costs = [cost for cost, hit in zip(costs, hits) if not hit]
+        computed = parallel_map(func, prefetch(misses) if prefetch else misses, jobs, costs, budget, on_timings)
+        miss_set = set(misses)
+
+        try:
+            for image_path, key in zip(image_paths, keys):
+                data = None if image_path in miss_set else cache.get(key)
+                if data is None:
+                    if image_path in miss_set:
+                        data = next(computed)
+                    elif on_timings:
+                        data, timings = timed_call(func, image_path)
+                        on_timings(timings)
+                    else:
+                        data = func(image_path)
+                    cache.put(key, data)
+                elif on_timings:
+                    on_timings({'cache_hit': 1})
+                yield data
+        finally:
+            computed.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='图片压缩结果缓存管理')
+    parser.add_argument('--cache-dir', default=None, help='缓存目录，默认为用户目录下的缓存')
+    parser.add_argument('--clear', action='store_true', help='清空缓存')
+    args = parser.parse_args()
+
+    if args.clear:
+        clear_cache(args.cache_dir)
+        print('缓存已清空')
+    else:
+        with ResizeCache(args.cache_dir) as cache:
+            count = cache.conn.execute('SELECT COUNT(*) FROM entries').fetchone()[0]
+            print(f'缓存目录: {cache.cache_dir}')
+            print(f'缓存图片数: {count}, 占用空间: {cache.total_bytes / 1024 ** 2:.1f} MB')
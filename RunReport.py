@@ -0,0 +1,127 @@
+import cProfile
+import csv
+import json
+import os
+import threading
+import time
+from contextlib import nullcontext
+
+# 报告和cProfile结果写入输出文件夹，每次运行覆盖上一次的结果
+REPORT_NAME = 'export_report'
+PROFILE_NAME = 'export_profile.prof'
+# 每张图片记录的阶段，open/decode/resize/encode在压缩进程中测量
+IMAGE_STAGES = ('open', 'decode', 'resize', 'encode', 'wait', 'add_picture')
+
+
+class Stage:
+    def __init__(self, report, name, nbytes):
+        self.report = report
+        self.name = name
+        self.nbytes = nbytes
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.report.add(self.name, time.perf_counter() - self.start, self.nbytes)
+
+
+class RunReport:
+    # 记录导出各阶段的耗时和字节数，以及每张图片、每个文档的明细
+    # enabled为False时记录方法直接返回，可以一直保留在正式流程中
+    def __init__(self, enabled=False, profile=False):
+        self.enabled = enabled
+        self.profile = profile
+        self.stages = {}
+        self.images = []
+        self.documents = []
+        # 增量生成时跳过的子文件夹数和图片数
+        self.skipped_folders = 0
+        self.skipped_images = 0
+        self.start_time = time.perf_counter()
+        # 文档在后台线程中保存，记录时加锁
+        self.lock = threading.Lock()
+
+    def stage(self, name, nbytes=0):
+        # 用with包住一个阶段，关闭时返回不做任何事情的上下文
+        if not self.enabled:
+            return nullcontext()
+        return Stage(self, name, nbytes)
+
+    def add(self, name, seconds, nbytes=0, count=1):
+        if not self.enabled:
+            return
+        with self.lock:
+            total = self.stages.setdefault(name, {'count': 0, 'seconds': 0.0, 'bytes': 0})
+            total['count'] += count
+            total['seconds'] += seconds
+            total['bytes'] += nbytes
+
+    def add_image(self, path, input_bytes, output_bytes, timings):
+        if not self.enabled:
+            return
+        for name in IMAGE_STAGES:
+            if name in timings:
+                self.add(name, timings[name], output_bytes if name in ('encode', 'add_picture') else 0)
+        row = {'path': path, 'input_bytes': input_bytes, 'output_bytes': output_bytes,
+               'cache_hit': bool(timings.get('cache_hit')), 'passthrough': bool(timings.get('passthrough')),
+               'duplicate': bool(timings.get('duplicate'))}
+        row.update({name: timings.get(name, 0.0) for name in IMAGE_STAGES})
+        with self.lock:
+            self.images.append(row)
+
+    def skip(self, images):
+        # 记录一个因没有变化而跳过的子文件夹
+        self.skipped_folders += 1
+        self.skipped_images += images
+
+    def add_document(self, path, images, nbytes, save_seconds):
+        if not self.enabled:
+            return
+        self.add('document_save', save_seconds, os.path.getsize(path))
+        with self.lock:
+            self.documents.append({'path': path, 'images': images, 'image_bytes': nbytes,
+                                   'file_bytes': os.path.getsize(path), 'save': save_seconds})
+
+    def data(self):
+        return {'stages': self.stages, 'images': self.images, 'documents': self.documents}
+
+    def merge(self, data):
+        # 合并子进程中记录的结果
+        if not self.enabled:
+            return
+        for name, total in data['stages'].items():
+            self.add(name, total['seconds'], total['bytes'], total['count'])
+        with self.lock:
+            self.images.extend(data['images'])
+            self.documents.extend(data['documents'])
+
+    def profiling(self):
+        # 只分析当前线程，进程池中的压缩进程不在结果中
+        if not self.profile:
+            return nullcontext()
+        return cProfile.Profile()
+
+    def write(self, output_folder, finished, profiler=None):
+        if profiler is not None:
+            profiler.dump_stats(os.path.join(output_folder, PROFILE_NAME))
+        # 没有处理任何图片时（例如增量生成时全部跳过）保留上一次的报告，不用空结果覆盖
+        if not self.enabled or not (self.images or self.documents):
+            return
+
+        base = os.path.join(output_folder, REPORT_NAME)
+        summary = {'finished': finished, 'wall': time.perf_counter() - self.start_time,
+                   'images': len(self.images), 'documents': len(self.documents),
+                   'skipped_folders': self.skipped_folders, 'skipped_images': self.skipped_images}
+        with open(f'{base}.json', 'w', encoding='utf-8') as f:
+            json.dump({'summary': summary, **self.data()}, f, ensure_ascii=False, indent=2)
+
+        # CSV用utf-8-sig编码，Excel直接打开时中文路径不会乱码
+        for name, rows in (('images', self.images), ('documents', self.documents)):
+            if not rows:
+                continue
+            with open(f'{base}_{name}.csv', 'w', encoding='utf-8-sig', newline='') as f:
+                writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+                writer.writeheader()
+                writer.writerows(rows)
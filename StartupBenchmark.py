@@ -0,0 +1,76 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+# 启动时间测试：多次启动初始化界面，统计从进程启动到窗口显示的时间，以及第一次打开各工具时的导入时间
+LAUNCHER = os.path.join(os.path.dirname(os.path.abspath(__file__)), '初始化界面.py')
+
+
+def run_env():
+    # 初始化界面通过ImageConversionTools包导入工具，测试时把包所在的文件夹加入搜索路径
+    env = dict(os.environ)
+    parent = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, [parent, env.get('PYTHONPATH')]))
+    return env
+
+
+def measure_launcher(runs):
+    results = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        output = subprocess.run([sys.executable, LAUNCHER, '--benchmark'], capture_output=True, text=True,
+                                check=True, env=run_env()).stdout
+        results.append({'wall': time.perf_counter() - start, 'shown': float(output.strip().splitlines()[-1])})
+    return results
+
+
+def measure_tool_import(module_name, runs):
+    # 每次在新进程中导入，得到点击按钮后第一次打开工具时的导入开销
+    code = (f'import time; start = time.perf_counter(); import {module_name}; '
+            f'print(time.perf_counter() - start)')
+    return [float(subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True,
+                                 env=run_env()).stdout) for _ in range(runs)]
+
+
+def summary(values):
+    return {'min': min(values), 'median': statistics.median(values), 'max': max(values)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='初始化界面启动时间测试')
+    parser.add_argument('--runs', type=int, default=5, help='启动次数')
+    parser.add_argument('--budget', type=float, default=None, help='窗口显示时间中位数上限（秒），超过时返回1')
+    parser.add_argument('--tools', action='store_true', help='同时测试各工具第一次打开时的导入时间')
+    parser.add_argument('--json', default=None, help='把测试结果写入JSON文件')
+    args = parser.parse_args(argv)
+
+    launcher = measure_launcher(args.runs)
+    report = {'python': sys.version.split()[0], 'runs': args.runs,
+              'shown': summary([r['shown'] for r in launcher]), 'wall': summary([r['wall'] for r in launcher])}
+    print(f"窗口显示: 中位数 {report['shown']['median']:.3f} 秒 "
+          f"(最短 {report['shown']['min']:.3f} / 最长 {report['shown']['max']:.3f})")
+
+    if args.tools:
+        # 只导入模块，不依赖初始化界面中的TOOLS，避免测试本身加载PyQt5界面
+        report['tools'] = {}
+        for name, module_name in (('word', 'ImageConversionTools.ImportingPicturesIntoWord'),
+                                  ('excel', 'ImageConversionTools.跳转1')):
+            report['tools'][name] = summary(measure_tool_import(module_name, args.runs))
+            print(f"{name} 工具导入: 中位数 {report['tools'][name]['median']:.3f} 秒")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+    if args.budget is not None and report['shown']['median'] > args.budget:
+        print(f'启动时间超过预算 {args.budget:.3f} 秒')
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,21 @@
+from docx.table import _Cell
+
+
+class TableBuilder:
+    # 按从左到右、从上到下的顺序逐格放置内容，行数不够时自动追加新行
+    def __init__(self, document, rows, cols):
+        self.table = document.add_table(rows=rows, cols=cols)
+        self.cols = cols
+        self.index = 0
+        # 预先缓存所有单元格，避免每次调用table.cell()都重新生成整张表的单元格列表
+        self.grid = [self.row_cells(tr) for tr in self.table._tbl.tr_lst]
+
+    def row_cells(self, tr):
+        return [_Cell(tc, self.table) for tc in tr.tc_lst]
+
+    def next_cell(self):
+        row, col = divmod(self.index, self.cols)
+        if row == len(self.grid):
+            self.grid.append(self.row_cells(self.table.add_row()._tr))
+        self.index += 1
+        return self.grid[row][col]
@@ -0,0 +1,301 @@
+import io
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import ExifTags, Image
+from PyQt5.QtCore import QAbstractListModel, QModelIndex, QObject, QSize, Qt, pyqtSignal
+from PyQt5.QtGui import QColor, QImage, QPixmap
+from PyQt5.QtWidgets import QComboBox, QFormLayout, QLabel, QListView, QVBoxLayout, QWidget
+
+try:
+    from .FolderIndex import scan
+    from .ImageResize import draft_for_size
+except ImportError:
+    from FolderIndex import scan
+    from ImageResize import draft_for_size
+
+THUMBNAIL_SIZE = QSize(120, 90)
+# 缓存的缩略图数量上限，每张约40KB
+DEFAULT_CACHE_ITEMS = 1000
+LOADER_THREADS = 4
+# 快速滚动时只保留最近请求的缩略图，更早的请求直接丢弃
+MAX_PENDING = 256
+
+# EXIF第二个IFD中缩略图数据的位置和长度
+EXIF_THUMBNAIL_OFFSET = 0x0201
+EXIF_THUMBNAIL_LENGTH = 0x0202
+
+
+def exif_thumbnail(image):
+    # 相机写入JPEG文件头的小缩略图，不需要解码原图；没有时返回None
+    raw = image.info.get('exif')
+    if not raw:
+        return None
+    ifd1 = image.getexif().get_ifd(ExifTags.IFD.IFD1)
+    offset = ifd1.get(EXIF_THUMBNAIL_OFFSET)
+    length = ifd1.get(EXIF_THUMBNAIL_LENGTH)
+    if not offset or not length:
+        return None
+    # 偏移量从TIFF头开始计算，JPEG中的EXIF数据前面还有Exif\0\0
+    if raw.startswith(b'Exif\x00\x00'):
+        offset += 6
+    try:
+        thumbnail = Image.open(io.BytesIO(raw[offset:offset + length]))
+        thumbnail.load()
+    except (OSError, SyntaxError, ValueError):
+        return None
+    return thumbnail
+
+
+def load_thumbnail(image_path, width, height):
+    # 在后台线程中运行：优先使用EXIF缩略图，没有时按缩小后的分辨率解码原图；无法读取时返回None
+    try:
+        with Image.open(image_path) as image:
+            thumbnail = exif_thumbnail(image) if image.format in ('JPEG', 'MPO') else None
+            if thumbnail is None:
+                draft_for_size(image, (width, height))
+                thumbnail = image
+            thumbnail.thumbnail((width, height))
+            thumbnail = thumbnail.convert('RGBA')
+    except (OSError, SyntaxError, ValueError, Image.DecompressionBombError):
+        return None
+    # QImage不复制传入的数据，copy后才能在数据释放后继续使用
+    return QImage(thumbnail.tobytes('raw', 'RGBA'), thumbnail.width, thumbnail.height,
+                  QImage.Format_RGBA8888).copy()
+
+
+def part_ranges(count, cols, max_part_images):
+    # 与导出时的拆分规则相同：达到图片数上限后在整行结束处开始下一个文档
+    # 返回每个文档包含的图片范围(开始, 结束)
+    if not max_part_images:
+        return [(0, count)]
+    part_size = -(-max_part_images // cols) * cols
+    return [(start, min(start + part_size, count)) for start in range(0, count, part_size)] or [(0, 0)]
+
+
+class PixmapCache:
+    # 按最近使用顺序保存缩略图，超出上限时淘汰最久没有使用的，内存占用与文件夹中的图片数量无关
+    def __init__(self, max_items=DEFAULT_CACHE_ITEMS):
+        self.max_items = max_items
+        self.items = OrderedDict()
+
+    def get(self, key):
+        pixmap = self.items.get(key)
+        if pixmap is not None:
+            self.items.move_to_end(key)
+        return pixmap
+
+    def put(self, key, pixmap):
+        self.items[key] = pixmap
+        self.items.move_to_end(key)
+        while len(self.items) > self.max_items:
+            self.items.popitem(last=False)
+
+
+class ThumbnailLoader(QObject):
+    # 在后台线程中加载缩略图，最近请求的先加载，滚动后当前可见的图片优先显示
+    # QPixmap只能在界面线程中使用，后台线程只生成QImage
+    loaded = pyqtSignal(str, QImage)
+
+    def __init__(self, size, parent=None, threads=LOADER_THREADS):
+        super().__init__(parent)
+        self.size = size
+        self.lock = threading.Lock()
+        self.pending = OrderedDict()
+        self.loading = set()
+        self.executor = ThreadPoolExecutor(max_workers=threads)
+
+    def request(self, image_path):
+        with self.lock:
+            if image_path in self.loading:
+                return
+            if image_path in self.pending:
+                self.pending.move_to_end(image_path)
+                return
+            self.pending[image_path] = None
+            if len(self.pending) > MAX_PENDING:
+                self.pending.popitem(last=False)
+        self.executor.submit(self.load_next)
+
+    def clear(self):
+        with self.lock:
+            self.pending.clear()
+
+    def load_next(self):
+        with self.lock:
+            if not self.pending:
+                return
+            image_path, _ = self.pending.popitem()
+            self.loading.add(image_path)
+        try:
+            image = load_thumbnail(image_path, self.size.width(), self.size.height())
+            self.loaded.emit(image_path, image if image is not None else QImage())
+        finally:
+            with self.lock:
+                self.loading.discard(image_path)
+
+
+class ThumbnailModel(QAbstractListModel):
+    # 只有视图需要显示的图片才会请求缩略图，一万张图片的文件夹也不会全部解码
+    def __init__(self, cache, loader, parent=None):
+        super().__init__(parent)
+        self.cache = cache
+        self.loader = loader
+        self.images = []
+        self.rows = {}
+        self.placeholder = QPixmap(loader.size)
+        self.placeholder.fill(QColor(224, 224, 224))
+        self.loader.loaded.connect(self.thumbnail_loaded)
+
+    def set_images(self, images):
+        self.beginResetModel()
+        self.images = list(images)
+        self.rows = {image.path: row for row, image in enumerate(self.images)}
+        # 切换页面后不再需要之前页面还没有加载的缩略图
+        self.loader.clear()
+        self.endResetModel()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.images)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        image = self.images[index.row()]
+        if role == Qt.DisplayRole:
+            return image.name
+        if role == Qt.ToolTipRole:
+            return image.path
+        if role == Qt.DecorationRole:
+            pixmap = self.cache.get(image.path)
+            if pixmap is None:
+                self.loader.request(image.path)
+                return self.placeholder
+            return pixmap
+        return None
+
+    def thumbnail_loaded(self, image_path, image):
+        # 无法读取的图片也缓存为空图片，不再重复加载
+        self.cache.put(image_path, QPixmap.fromImage(image))
+        row = self.rows.get(image_path)
+        if row is not None:
+            index = self.index(row)
+            self.dataChanged.emit(index, index, [Qt.DecorationRole])
+
+
+class ThumbnailPreview(QWidget):
+    # 导出前预览：按导出顺序显示所选子文件夹的图片，每页对应一个将要生成的文档
+    plan_ready = pyqtSignal(str, object)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.root_folder = None
+        self.plan = None
+        self.cols = 2
+        self.max_part_images = None
+        self.pages = []
+
+        self.cache = PixmapCache()
+        self.loader = ThumbnailLoader(THUMBNAIL_SIZE, self)
+        self.model = ThumbnailModel(self.cache, self.loader, self)
+        # 扫描网络共享上的大文件夹较慢，在后台线程中完成
+        self.scan_executor = ThreadPoolExecutor(max_workers=1)
+        self.plan_ready.connect(self.apply_plan)
+
+        self.folder_input = QComboBox(self)
+        self.folder_input.currentIndexChanged.connect(self.update_pages)
+        self.page_input = QComboBox(self)
+        self.page_input.currentIndexChanged.connect(self.show_page)
+        form_layout = QFormLayout()
+        form_layout.addRow('子文件夹:', self.folder_input)
+        form_layout.addRow('文档:', self.page_input)
+
+        # 图标模式下各项大小相同，视图只布局和绘制可见的部分
+        self.view = QListView(self)
+        self.view.setModel(self.model)
+        self.view.setViewMode(QListView.IconMode)
+        self.view.setIconSize(THUMBNAIL_SIZE)
+        self.view.setGridSize(QSize(THUMBNAIL_SIZE.width() + 16, THUMBNAIL_SIZE.height() + 32))
+        self.view.setUniformItemSizes(True)
+        self.view.setResizeMode(QListView.Adjust)
+        self.view.setMovement(QListView.Static)
+        self.view.setLayoutMode(QListView.Batched)
+        self.view.setBatchSize(500)
+        self.view.setWordWrap(False)
+
+        self.summary_label = QLabel('选择图片文件夹后显示预览', self)
+
+        layout = QVBoxLayout()
+        layout.addLayout(form_layout)
+        layout.addWidget(self.view, 1)
+        layout.addWidget(self.summary_label)
+        self.setLayout(layout)
+
+    def set_root(self, root_folder):
+        if root_folder == self.root_folder:
+            return
+        self.root_folder = root_folder
+        self.plan = None
+        self.folder_input.clear()
+        if not root_folder or not os.path.isdir(root_folder):
+            self.summary_label.setText('选择图片文件夹后显示预览')
+            return
+        self.summary_label.setText('正在扫描文件夹...')
+        self.scan_executor.submit(self.scan_root, root_folder)
+
+    def scan_root(self, root_folder):
+        try:
+            plan = scan(root_folder)
+        except OSError:
+            plan = None
+        self.plan_ready.emit(root_folder, plan)
+
+    def apply_plan(self, root_folder, plan):
+        # 扫描期间又选择了其他文件夹时丢弃结果
+        if root_folder != self.root_folder:
+            return
+        self.plan = plan
+        if plan is None or not plan.folders:
+            self.summary_label.setText('没有找到包含图片的子文件夹')
+            return
+        self.folder_input.blockSignals(True)
+        for folder in plan.folders:
+            self.folder_input.addItem(f'{folder.key} ({len(folder.images)} 张)')
+        self.folder_input.blockSignals(False)
+        self.summary_label.setText(f'共 {len(plan.folders)} 个子文件夹，{plan.total_images} 张图片')
+        self.update_pages()
+
+    def set_layout(self, cols, max_part_images):
+        # 表格列数或拆分设置变化时重新分页
+        self.cols = max(cols, 1)
+        self.max_part_images = max_part_images
+        self.update_pages()
+
+    def current_folder(self):
+        index = self.folder_input.currentIndex()
+        if self.plan is None or index < 0:
+            return None
+        return self.plan.folders[index]
+
+    def update_pages(self):
+        folder = self.current_folder()
+        self.page_input.blockSignals(True)
+        self.page_input.clear()
+        self.pages = part_ranges(len(folder.images), self.cols, self.max_part_images) if folder else []
+        for number, (start, end) in enumerate(self.pages, 1):
+            name = f'{folder.name}_part{number:02d}.docx' if len(self.pages) > 1 else f'{folder.name}.docx'
+            self.page_input.addItem(f'{name}（第 {start + 1}-{end} 张）')
+        self.page_input.blockSignals(False)
+        self.show_page()
+
+    def show_page(self):
+        folder = self.current_folder()
+        index = self.page_input.currentIndex()
+        if folder is None or index < 0:
+            self.model.set_images([])
+            return
+        start, end = self.pages[index]
+        self.model.set_images(folder.images[start:end])
+        self.view.scrollToTop()
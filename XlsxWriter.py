@@ -0,0 +1,203 @@
+import hashlib
+import io
+import os
+import shutil
+import tempfile
+import zipfile
+from xml.sax.saxutils import quoteattr
+
+from lxml import etree
+from openpyxl import Workbook
+from openpyxl.drawing.image import Image as XLImage
+from openpyxl.utils import get_column_letter
+from openpyxl.utils.units import pixels_to_EMU
+from PIL import Image
+
+try:
+    from .DocxWriter import RELS_NS, TYPES_NS, IMAGE_REL_TYPE, read_image
+except ImportError:
+    from DocxWriter import RELS_NS, TYPES_NS, IMAGE_REL_TYPE, read_image
+
+DRAWING_REL_TYPE = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships/drawing'
+DRAWING_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.drawing+xml'
+SHEET_PART = 'xl/worksheets/sheet1.xml'
+
+# 与openpyxl的ws.add_image生成的图片锚点保持一致
+ANCHOR_XML = (
+    '<oneCellAnchor><from><col>{col}</col><colOff>0</colOff><row>{row}</row><rowOff>0</rowOff></from>'
+    '<ext cx="{cx}" cy="{cy}"/><pic><nvPicPr><cNvPr id="{number}" name="Image {number}" descr="Picture"/><cNvPicPr/>'
+    '</nvPicPr><blipFill><a:blip cstate="print" r:embed="{rel_id}"/><a:stretch><a:fillRect/></a:stretch>'
+    '</blipFill><spPr><a:prstGeom prst="rect"/></spPr></pic><clientData/></oneCellAnchor>'
+)
+DRAWING_HEAD = ('<wsDr xmlns="http://schemas.openxmlformats.org/drawingml/2006/spreadsheetDrawing" '
+                'xmlns:a="http://schemas.openxmlformats.org/drawingml/2006/main" '
+                'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">')
+
+
+def grid_geometry(image_width, image_height):
+    # 由图片显示尺寸（像素）得到列宽（字符数）和行高（磅），整个表格只计算一次
+    return image_width // 7.3, image_height * 0.8
+
+
+class XlsxWriter:
+    # 使用openpyxl生成表格，全部图片在内存中，保存时一次写出；内容相同的图片也各保存一份
+    def __init__(self, xlsx_path, cols, image_width, image_height):
+        self.xlsx_path = xlsx_path
+        self.cols = cols
+        self.image_width = image_width
+        self.image_height = image_height
+        self.column_width, self.row_height = grid_geometry(image_width, image_height)
+        self.index = 0
+        self.workbook = Workbook()
+        self.sheet = self.workbook.active
+        for col in range(1, cols + 1):
+            self.sheet.column_dimensions[get_column_letter(col)].width = self.column_width
+
+    def add_picture(self, image):
+        row, col = divmod(self.index, self.cols)
+        # 每行第一张图片时设置行高
+        if col == 0:
+            self.sheet.row_dimensions[row + 1].height = self.row_height
+        img = XLImage(image)
+        img.width = self.image_width
+        img.height = self.image_height
+        self.sheet.add_image(img, f'{get_column_letter(col + 1)}{row + 1}')
+        self.index += 1
+
+    def save(self):
+        self.workbook.save(self.xlsx_path)
+
+    def abort(self):
+        # 放弃未完成的表格，内存中的内容直接丢弃即可
+        self.workbook = None
+
+
+class StreamingXlsxWriter:
+    # 流式生成表格：每张图片处理完立即写入压缩包，图片锚点逐个写入临时文件，内存占用与图片数量无关
+    def __init__(self, xlsx_path, cols, image_width, image_height):
+        self.xlsx_path = xlsx_path
+        self.cols = cols
+        self.cx = pixels_to_EMU(image_width)
+        self.cy = pixels_to_EMU(image_height)
+        column_width, self.row_height = grid_geometry(image_width, image_height)
+        self.cols_xml = ''.join(f'<col width="{column_width:g}" customWidth="1" min="{col}" max="{col}"/>'
+                                for col in range(1, cols + 1))
+        self.index = 0
+        # 图片内容哈希对应的关系ID，内容相同的图片只写入一份，各锚点引用同一个关系
+        self.media = {}
+
+        # 先写到临时文件，全部完成后再改名，中途出错不会留下不完整的文件
+        self.temp_path = f'{xlsx_path}.part'
+        self.zip_file = zipfile.ZipFile(self.temp_path, 'w', zipfile.ZIP_DEFLATED)
+        self.drawing = tempfile.TemporaryFile()
+        self.drawing_rels = tempfile.TemporaryFile()
+
+        # 用openpyxl生成一个空工作簿作为模板，复制其中的样式、主题等部件
+        buffer = io.BytesIO()
+        Workbook().save(buffer)
+        with zipfile.ZipFile(buffer) as template:
+            for name in template.namelist():
+                if name in ('[Content_Types].xml', SHEET_PART):
+                    continue
+                self.zip_file.writestr(name, template.read(name))
+            self.content_types = etree.fromstring(template.read('[Content_Types].xml'))
+            sheet_xml = template.read(SHEET_PART).decode('utf-8')
+        self.extensions = {item.get('Extension') for item in self.content_types
+                           if item.tag == f'{{{TYPES_NS}}}Default'}
+
+        # 拆出工作表的开头和结尾，列宽和各行行高在保存时按图片数量一次写出
+        data_start = sheet_xml.index('<sheetData')
+        data_end = sheet_xml.index('</sheetData>') + len('</sheetData>')
+        self.sheet_head = sheet_xml[:data_start]
+        self.sheet_tail = sheet_xml[data_end:sheet_xml.rindex('</worksheet>')]
+
+        self.drawing.write(DRAWING_HEAD.encode('utf-8'))
+        self.drawing_rels.write(f'<Relationships xmlns="{RELS_NS}">'.encode('utf-8'))
+
+    def add_picture(self, image):
+        blob, _ = read_image(image)
+        digest = hashlib.sha1(blob).hexdigest()
+        rel_id = self.media.get(digest)
+        if rel_id is None:
+            rel_id = self.add_media(blob)
+            self.media[digest] = rel_id
+
+        number = self.index + 1
+        row, col = divmod(self.index, self.cols)
+        self.drawing.write(ANCHOR_XML.format(col=col, row=row, cx=self.cx, cy=self.cy, number=number,
+                                             rel_id=rel_id).encode('utf-8'))
+        self.index += 1
+
+    def add_media(self, blob):
+        # 图片数据直接写入压缩包，不在内存中保留，返回图片的关系ID
+        with Image.open(io.BytesIO(blob)) as info:
+            ext = info.format.lower()
+            content_type = info.get_format_mimetype()
+            # 与openpyxl相同，JPEG、PNG、GIF以外的格式转换为PNG
+            if info.format not in ('JPEG', 'PNG', 'GIF'):
+                buffer = io.BytesIO()
+                info.save(buffer, format='PNG')
+                blob, ext, content_type = buffer.getvalue(), 'png', 'image/png'
+
+        number = len(self.media) + 1
+        partname = f'/xl/media/image{number}.{ext}'
+        self.zip_file.writestr(partname[1:], blob, compress_type=zipfile.ZIP_STORED)
+        if ext not in self.extensions:
+            etree.SubElement(self.content_types, f'{{{TYPES_NS}}}Default', Extension=ext, ContentType=content_type)
+            self.extensions.add(ext)
+
+        rel_id = f'rId{number}'
+        self.drawing_rels.write(f'<Relationship Type="{IMAGE_REL_TYPE}" Target={quoteattr(partname)} '
+                                f'Id="{rel_id}"/>'.encode('utf-8'))
+        return rel_id
+
+    def write_sheet(self):
+        # 列宽和行高只与列数、行数有关，不需要为每张图片重复设置
+        rows = -(-self.index // self.cols)
+        with self.zip_file.open(SHEET_PART, 'w', force_zip64=True) as f:
+            f.write(self.sheet_head.encode('utf-8'))
+            f.write(f'<cols>{self.cols_xml}</cols><sheetData>'.encode('utf-8'))
+            row_xml = f'<row r="{{}}" ht="{self.row_height:g}" customHeight="1"/>'
+            for row in range(1, rows + 1):
+                f.write(row_xml.format(row).encode('utf-8'))
+            f.write('</sheetData>'.encode('utf-8'))
+            f.write(self.sheet_tail.encode('utf-8'))
+            if self.index:
+                f.write('<drawing xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships" '
+                        'r:id="rId1"/>'.encode('utf-8'))
+            f.write('</worksheet>'.encode('utf-8'))
+
+    def save(self):
+        self.write_sheet()
+        if self.index:
+            self.drawing.write('</wsDr>'.encode('utf-8'))
+            self.drawing_rels.write('</Relationships>'.encode('utf-8'))
+            for name, part in (('xl/drawings/drawing1.xml', self.drawing),
+                               ('xl/drawings/_rels/drawing1.xml.rels', self.drawing_rels)):
+                part.seek(0)
+                with self.zip_file.open(name, 'w', force_zip64=True) as f:
+                    shutil.copyfileobj(part, f)
+            self.zip_file.writestr('xl/worksheets/_rels/sheet1.xml.rels',
+                                   f'<Relationships xmlns="{RELS_NS}"><Relationship Type="{DRAWING_REL_TYPE}" '
+                                   f'Target="/xl/drawings/drawing1.xml" Id="rId1"/></Relationships>')
+            etree.SubElement(self.content_types, f'{{{TYPES_NS}}}Override', PartName='/xl/drawings/drawing1.xml',
+                             ContentType=DRAWING_CONTENT_TYPE)
+        self.drawing.close()
+        self.drawing_rels.close()
+        self.zip_file.writestr('[Content_Types].xml',
+                               etree.tostring(self.content_types, xml_declaration=True, encoding='UTF-8',
+                                              standalone=True))
+        self.zip_file.close()
+        os.replace(self.temp_path, self.xlsx_path)
+
+    def abort(self):
+        # 放弃未完成的表格，删除临时文件；可以重复调用，已保存的表格不受影响
+        try:
+            self.drawing.close()
+            self.drawing_rels.close()
+            self.zip_file.close()
+        finally:
+            try:
+                os.remove(self.temp_path)
+            except FileNotFoundError:
+                pass
@@ -1,8 +1,23 @@
+import time
+
+# 记录启动时间，用于启动时间测试
+START_TIME = time.perf_counter()
+
 import sys
+import importlib
+import multiprocessing
 from PyQt5.QtWidgets import QApplication, QWidget, QPushButton, QVBoxLayout, QHBoxLayout, QDesktopWidget, QLabel, QSpacerItem, QSizePolicy
-from PyQt5.QtCore import Qt
-from PyQt5.QtGui import QPixmap, QIcon, QPalette, QBrush
-from ImageConversionTools.ImportingPicturesIntoWord import App
+from PyQt5.QtCore import Qt, QTimer
+from PyQt5.QtGui import QIcon, QPalette, QBrush
+from ImageConversionTools.BackgroundCache import scaled_background
+
+# 各工具窗口所在的模块和类名，点击按钮时才导入，启动时不加载python-docx、openpyxl、Pillow等依赖
+# 压缩、裁剪、比例转换等工具完成后在这里登记即可
+TOOLS = {
+    'word': ('ImageConversionTools.ImportingPicturesIntoWord', 'App'),
+    'excel': ('ImageConversionTools.跳转1', 'InsertImagesToExcelWindow'),
+}
+
 
 class MainWindow(QWidget):
     def __init__(self):
@@ -15,6 +30,9 @@ class MainWindow(QWidget):
         # 设置窗口图标
         self.setWindowIcon(QIcon("./icon/00002.png"))  # 将 "icon.png" 替换为你的图标文件路径
 
+        # 已经打开的工具窗口
+        self.tool_windows = {}
+
         # 设置背景图片
         self.set_background("./Pictures/00065-3853250584.png")  # 将 "background.jpg" 替换为你的图片路径
 
@@ -40,6 +58,7 @@ class MainWindow(QWidget):
 
         # 设置按钮点击事件
         self.btn_convert_to_word.clicked.connect(self.open_ITW_window)
+        self.btn_convert_to_excel.clicked.connect(self.open_excel_window)
         self.btn_exit.clicked.connect(self.exit_program)  # 绑定退出事件
 
         # 创建布局
@@ -183,8 +202,7 @@ class MainWindow(QWidget):
     def set_background(self, image_path):
         # 设置背景图片
         palette = QPalette()
-        pixmap = QPixmap(image_path)  # 加载背景图片
-        pixmap = pixmap.scaled(self.size(), Qt.KeepAspectRatioByExpanding)  # 缩放图片以填充窗口
+        pixmap = scaled_background(image_path, self.width(), self.height())  # 加载按窗口大小缓存的背景图片
         palette.setBrush(QPalette.Background, QBrush(pixmap))
         self.setPalette(palette)
 
@@ -192,14 +210,41 @@ class MainWindow(QWidget):
         # 退出程序
         QApplication.quit()
 
+    def open_tool(self, name):
+        # 第一次打开时才导入工具模块，导入期间显示等待光标
+        module_name, class_name = TOOLS[name]
+        QApplication.setOverrideCursor(Qt.WaitCursor)
+        try:
+            module = importlib.import_module(module_name)
+            window = getattr(module, class_name)()
+        finally:
+            QApplication.restoreOverrideCursor()
+        self.tool_windows[name] = window
+        window.show()
+        return window
+
     def open_ITW_window(self):
         # 创建并启动 ITW 的应用窗口
-        self.itw_app = App()  # 实例化 ITW 中的 App 类
-        self.itw_app.show()  # 显示 ITW 的窗口
+        self.itw_app = self.open_tool('word')
         # 注意：这里不关闭主窗口，保留原UI界面
 
+    def open_excel_window(self):
+        # 创建并启动图片插入Excel的窗口
+        self.open_tool('excel')
+
 if __name__ == "__main__":
+    # 打包后进程池的子进程会重新运行启动界面，需要先交给multiprocessing处理
+    multiprocessing.freeze_support()
     app = QApplication(sys.argv)
     window = MainWindow()
     window.show()
+
+    # 启动时间测试：窗口显示后输出从启动到显示的秒数并退出
+    if '--benchmark' in sys.argv:
+        def report_startup():
+            print(f'{time.perf_counter() - START_TIME:.4f}')
+            app.quit()
+
+        QTimer.singleShot(0, report_startup)
+
     sys.exit(app.exec_())
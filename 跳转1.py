@@ -1,12 +1,45 @@
 import sys
-import os
+import multiprocessing
 from PyQt5.QtWidgets import QApplication, QWidget, QPushButton, QVBoxLayout, QHBoxLayout, QFileDialog, QProgressBar, QLabel, QLineEdit
-from PyQt5.QtCore import Qt
+from PyQt5.QtCore import Qt, QThread, pyqtSignal
 from PyQt5.QtGui import QPixmap, QIcon
-from openpyxl import Workbook
-from openpyxl.utils import get_column_letter
-from openpyxl.drawing.image import Image as XLImage
-from PIL import Image
+
+try:
+    from .ExportEngine import ExportControl, export_excel
+except ImportError:
+    from ExportEngine import ExportControl, export_excel
+
+
+# 后台线程中生成Excel文件，避免界面卡死
+class ExcelWorker(QThread):
+    progress_changed = pyqtSignal(int)
+    status_changed = pyqtSignal(str)
+    task_completed = pyqtSignal()
+    task_cancelled = pyqtSignal()
+    error_occurred = pyqtSignal(str)
+
+    def __init__(self, image_folder, output_folder):
+        super().__init__()
+        self.image_folder = image_folder
+        self.output_folder = output_folder
+
+    def run(self):
+        try:
+            finished = insert_images_to_excel(self.image_folder, self.output_folder, self.report_progress,
+                                              cancel_check=self.isInterruptionRequested,
+                                              status_callback=self.status_changed.emit)
+        except Exception as e:
+            self.error_occurred.emit(str(e))
+            return
+
+        if finished:
+            self.task_completed.emit()
+        else:
+            self.task_cancelled.emit()
+
+    def report_progress(self, value):
+        self.progress_changed.emit(int(value))
+
 
 # 新的界面：图片插入Excel程序
 class InsertImagesToExcelWindow(QWidget):
@@ -39,10 +72,18 @@ class InsertImagesToExcelWindow(QWidget):
         self.progress_bar.setRange(0, 100)
         self.progress_bar.setValue(0)
 
+        # 处理速度和剩余时间
+        self.status_label = QLabel(self)
+
         # 启动按钮
         self.start_button = QPushButton('Start Generating', self)
         self.start_button.clicked.connect(self.save_credentials)
 
+        # 取消按钮
+        self.cancel_button = QPushButton('Cancel', self)
+        self.cancel_button.setEnabled(False)
+        self.cancel_button.clicked.connect(self.cancel_task)
+
         # 布局
         layout = QVBoxLayout()
         layout.addWidget(self.account_label)
@@ -52,7 +93,9 @@ class InsertImagesToExcelWindow(QWidget):
         layout.addWidget(self.password_input)
         layout.addWidget(self.password_button)
         layout.addWidget(self.progress_bar)
+        layout.addWidget(self.status_label)
         layout.addWidget(self.start_button)
+        layout.addWidget(self.cancel_button)
 
         self.setLayout(layout)
 
@@ -76,16 +119,28 @@ class InsertImagesToExcelWindow(QWidget):
 
         # 启动文件生成进程
         self.progress_bar.setValue(0)  # Reset progress bar
+        self.progress_bar.setFormat('%p%')
         self.start_button.setEnabled(False)
-
-        # 调用函数将图片插入Excel文件中
-        try:
-            insert_images_to_excel(image_folder, output_folder, self.update_progress)
-            self.show_success("Task completed successfully!")
-        except Exception as e:
-            self.show_error(f"An error occurred: {str(e)}")
-
+        self.cancel_button.setEnabled(True)
+
+        # 在后台线程中调用函数将图片插入Excel文件中
+        self.worker = ExcelWorker(image_folder, output_folder)
+        self.worker.progress_changed.connect(self.update_progress)
+        self.worker.status_changed.connect(self.status_label.setText)
+        self.worker.task_completed.connect(lambda: self.show_success("Task completed successfully!"))
+        self.worker.task_cancelled.connect(self.show_cancelled)
+        self.worker.error_occurred.connect(lambda message: self.show_error(f"An error occurred: {message}"))
+        self.worker.finished.connect(self.task_finished)
+        self.worker.start()
+
+    def cancel_task(self):
+        # 通知后台线程在处理完当前图片后停止
+        self.cancel_button.setEnabled(False)
+        self.worker.requestInterruption()
+
+    def task_finished(self):
         self.start_button.setEnabled(True)
+        self.cancel_button.setEnabled(False)
 
     def update_progress(self, value):
         self.progress_bar.setValue(int(value))
@@ -98,58 +153,20 @@ class InsertImagesToExcelWindow(QWidget):
         self.progress_bar.setValue(100)
         self.progress_bar.setFormat(f"Success: {message}")
 
+    def show_cancelled(self):
+        self.progress_bar.setFormat("Cancelled at %p%")
 
-def insert_images_to_excel(image_folder, output_folder, progress_callback):
-    total_images = sum([len(files) for _, _, files in os.walk(image_folder) if any(f.endswith(('.png', '.jpg', '.jpeg', 'JPG')) for f in files)])
-    current_image = 0
-
-    # 遍历指定文件夹中的所有子文件夹
-    for subfolder in os.listdir(image_folder):
-        subfolder_path = os.path.join(image_folder, subfolder)
-        if os.path.isdir(subfolder_path):
-            # 创建一个新的工作簿
-            wb = Workbook()
-            ws = wb.active
-
-            # 获取子文件夹名称作为Excel文件的名称
-            excel_file = f"{output_folder}/{subfolder}.xlsx"
-
-            # 初始化行和列的计数器
-            row = 1
-            col = 1
-
-            # 遍历子文件夹中的所有图片文件
-            for image_file in sorted(os.listdir(subfolder_path)):
-                if image_file.endswith(('.png', '.jpg', '.jpeg', 'JPG')):
-                    img_path = os.path.join(subfolder_path, image_file)
-                    img = Image.open(img_path)
-
-                    # 将图片大小调整为高2000，宽1500 cm（转换为像素）
-                    img = img.resize((2000, 1500))  # 宽度和高度需要转换为像素
-                    img.save(img_path)
-
-                    # 将图片插入到Excel表格中
-                    img = XLImage(img_path)
-                    img.width = 903 // 6 * 2.3
-                    img.height = 677 // 6 * 2.3
-
-                    ws.column_dimensions[get_column_letter(col)].width = img.width // 7.3
-                    ws.row_dimensions[row].height = img.height * 0.8
-
-                    ws.add_image(img, f"{get_column_letter(col)}{row}")
-
-                    # 更新行和列的计数器
-                    col += 1
-                    if col > 5:
-                        col = 1
-                        row += 1
 
-                    # 更新进度条
-                    current_image += 1
-                    progress_callback(current_image / total_images * 100)
+def insert_images_to_excel(image_folder, output_folder, progress_callback, fast_decode=True, use_cache=True,
+                           cancel_check=None, status_callback=None):
+    # 实际的导出工作由ExportEngine完成，这里把进度拆分为百分比和状态文字两个回调
+    def report_progress(tracker):
+        progress_callback(tracker.percent())
+        if status_callback:
+            status_callback(tracker.status_text())
 
-            # 保存Excel文件
-            wb.save(excel_file)
+    return export_excel(image_folder, output_folder, fast_decode=fast_decode, use_cache=use_cache,
+                        progress_callback=report_progress, control=ExportControl(cancel_check))
 
 
 # 主窗口
@@ -190,6 +207,7 @@ class MainWindow(QWidget):
 
 
 if __name__ == '__main__':
+    multiprocessing.freeze_support()
     app = QApplication(sys.argv)
     window = MainWindow()
     window.show()